@@ -0,0 +1,111 @@
+import os
+from shutil import copy2, copystat
+from manifest import hash_file
+from staging import remove_compressed_siblings
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: reflink falls back to a copy
+    fcntl = None
+
+
+SYNC_MODES = ["copy", "hardlink", "reflink", "sendfile"]
+
+# ioctl request cloning a whole file on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def files_identical(src_path, dest_path):
+    """
+    Tells whether dest_path already holds the content of src_path.
+
+    Size and mtime are compared first (copy2 preserves the mtime);
+    only files of equal size with different mtimes are hashed.
+    """
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    src_stat = os.stat(src_path)
+    if (src_stat.st_dev, src_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino):
+        return True
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    return hash_file(src_path) == hash_file(dest_path)
+
+
+def sync_asset(src_path, dest_path, mode="copy"):
+    """
+    Makes dest_path a copy of src_path unless it already is one.
+    Returns True if bytes (or a link) were written.
+
+    mode "hardlink" links the output to the source, "reflink" clones it
+    on filesystems that support it and "sendfile" copies in the kernel;
+    each falls back to a regular copy when the filesystem refuses.
+    """
+    if files_identical(src_path, dest_path):
+        return False
+
+    if mode == "hardlink":
+        try:
+            _replace_with(dest_path, lambda tmp_path: os.link(src_path, tmp_path))
+            return True
+        except OSError:
+            pass
+    elif mode == "reflink":
+        try:
+            _replace_with(dest_path, lambda tmp_path: _reflink(src_path, tmp_path))
+            return True
+        except OSError:
+            pass
+    elif mode == "sendfile" and hasattr(os, "sendfile"):
+        try:
+            _replace_with(dest_path, lambda tmp_path: _sendfile(src_path, tmp_path))
+            return True
+        except OSError:
+            pass
+
+    # Never copy over dest_path in place: it may be a hard link
+    # shared with the served output
+    _replace_with(dest_path, lambda tmp_path: copy2(src_path, tmp_path))
+    return True
+
+
+def _replace_with(dest_path, create):
+    """
+    Creates the new file next to dest_path, then renames it over it
+    (dropping the precompressed siblings of the old one).
+    """
+    tmp_path = f"{dest_path}.sync-tmp"
+    try:
+        create(tmp_path)
+        os.replace(tmp_path, dest_path)
+        remove_compressed_siblings(dest_path)
+    except OSError:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _reflink(src_path, dest_path):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+    copystat(src_path, dest_path)
+
+
+def _sendfile(src_path, dest_path):
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        remaining = os.fstat(src.fileno()).st_size
+        offset = 0
+        while remaining > 0:
+            sent = os.sendfile(dest.fileno(), src.fileno(), offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+    copystat(src_path, dest_path)
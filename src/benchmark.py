@@ -0,0 +1,323 @@
+import argparse
+import io
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from copy_static import copy_static_content
+from generate_content import generate_pages
+from inline_markdown import markdown_to_html_node, text_to_textnodes
+from textnode import TextType
+
+
+WORDS = ("the quick brown fox jumps over lazy dog ring hobbit elf wizard "
+         "mountain river forest tower shadow light song journey").split()
+SHAPES = ["links", "lists", "code", "small", "mixed"]
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+def _sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def _link_paragraph(rng):
+    # The parser rejects some mixes of images and links: draw again
+    while True:
+        paragraph = _inline_paragraph(rng)
+        if _legacy_accepts(paragraph):
+            return paragraph
+
+
+def _inline_paragraph(rng):
+    parts = []
+    for i in range(rng.randint(8, 24)):
+        parts.append(_sentence(rng, rng.randint(3, 8)))
+        kind = rng.randrange(5)
+        if kind == 0:
+            parts.append(f"[{_sentence(rng, 2)}](/blog/post{i})")
+        elif kind == 1:
+            parts.append(f"**{_sentence(rng, 2)}**")
+        elif kind == 2:
+            parts.append(f"_{_sentence(rng, 2)}_")
+        elif kind == 3:
+            parts.append(f"`{rng.choice(WORDS)}()`")
+        else:
+            parts.append(f"![{_sentence(rng, 2)}](/images/{rng.choice(WORDS)}.png)")
+    return " ".join(parts)
+
+
+def _list_block(rng):
+    items = rng.randint(20, 200)
+    if rng.random() < 0.5:
+        return "\n".join(f"- {_sentence(rng, 6)} [more](/x{i})" for i in range(items))
+    return "\n".join(f"{i + 1}. {_sentence(rng, 6)} **{rng.choice(WORDS)}**"
+                     for i in range(items))
+
+
+def _code_block(rng):
+    lines = [f"    {rng.choice(WORDS)} = {rng.randint(0, 999)}  # {_sentence(rng, 4)}"
+             for _ in range(rng.randint(200, 2000))]
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def generate_page(rng, shape):
+    """Returns the markdown of one synthetic page of the given shape."""
+    blocks = [f"# {_sentence(rng, 4).title()}"]
+    if shape == "links":
+        blocks += [_link_paragraph(rng) for _ in range(rng.randint(20, 60))]
+    elif shape == "lists":
+        blocks += [_list_block(rng) for _ in range(rng.randint(5, 15))]
+    elif shape == "code":
+        blocks += [_code_block(rng) for _ in range(rng.randint(1, 4))]
+    elif shape == "small":
+        blocks += [_sentence(rng, 12), f"> {_sentence(rng, 10)}"]
+    else:
+        for _ in range(rng.randint(10, 30)):
+            make_block = rng.choice([_link_paragraph, _list_block, _code_block])
+            blocks.append(make_block(rng))
+            blocks.append(f"## {_sentence(rng, 3)}")
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(dest_dir, pages=100, shape="mixed", seed=0):
+    """
+    Writes a synthetic site of markdown pages under dest_dir and
+    returns the list of files written. The same seed gives the same corpus.
+    """
+    rng = random.Random(seed)
+    written = []
+    for i in range(pages):
+        page_dir = Path(dest_dir) / "blog" / f"section{i % 10}"
+        page_dir.mkdir(parents=True, exist_ok=True)
+        path = page_dir / f"page{i}.md"
+        path.write_text(generate_page(rng, shape))
+        written.append(path)
+    return written
+
+
+def _legacy_accepts(paragraph):
+    try:
+        text_to_textnodes(paragraph, legacy=True)
+    except (ValueError, IndexError):
+        return False
+    return True
+
+
+def best_time(func, repeat):
+    """Returns the fastest of repeat runs of func, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmarks(pages=100, shape="mixed", seed=0, repeat=3, jobs=1):
+    """
+    Times each stage of the engine on a synthetic corpus and returns
+    a list of (name, seconds, megabytes, pages) results.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        files = generate_corpus(root / "content", pages, shape, seed)
+        (root / "content" / "index.css").write_text("body {}\n" * 1000)
+        template = root / "template.html"
+        template.write_text(TEMPLATE)
+
+        documents = [path.read_text() for path in files]
+        megabytes = sum(len(document.encode()) for document in documents) / 1e6
+        paragraphs = [block.replace("\n", " ") for document in documents
+                      for block in document.split("\n\n")
+                      if block[:1].isalpha()]
+        paragraph_mb = sum(len(block.encode()) for block in paragraphs) / 1e6
+
+        def inline(legacy):
+            for paragraph in paragraphs:
+                text_to_textnodes(paragraph, legacy)
+
+        if paragraphs:
+            results.append(("text_to_textnodes",
+                            best_time(lambda: inline(False), repeat),
+                            paragraph_mb, None))
+            results.append(("text_to_textnodes (legacy)",
+                            best_time(lambda: inline(True), repeat),
+                            paragraph_mb, None))
+
+        def parse():
+            return [markdown_to_html_node(document) for document in documents]
+        results.append(("markdown_to_html_node", best_time(parse, repeat),
+                        megabytes, pages))
+
+        nodes = parse()
+        def serialize():
+            for node in nodes:
+                node.to_html()
+        results.append(("ParentNode.to_html", best_time(serialize, repeat),
+                        megabytes, pages))
+
+        out = root / "out"
+        out.mkdir()
+        def generate():
+            with redirect_stdout(io.StringIO()):
+                for i, path in enumerate(files):
+                    generate_pages(path, template, out / f"page{i}.html", "/")
+        results.append(("generate_pages", best_time(generate, repeat),
+                        megabytes, pages))
+
+        def build():
+            public = root / "public"
+            public.mkdir(exist_ok=True)
+            with redirect_stdout(io.StringIO()):
+                copy_static_content(root / "content", public, template, "/",
+                                    jobs=jobs)
+        results.append((f"copy_static_content (jobs={jobs})",
+                        best_time(build, repeat), megabytes, pages))
+    return results
+
+
+def count_nodes(node):
+    count = 1
+    for child in node.children or ():
+        count += count_nodes(child)
+    return count
+
+
+class _SlottedNode():
+    __slots__ = ("tag", "value", "children", "props")
+
+    def __init__(self, tag, value, children, props):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+class _DictNode():
+    # The layout of the nodes before __slots__: attributes in a __dict__
+    def __init__(self, tag, value, children, props):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+class _SlottedTextNode():
+    __slots__ = ("text", "text_type", "url")
+
+    def __init__(self, text, text_type, url):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class _DictTextNode():
+    def __init__(self, text, text_type, url):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+def _copy_tree(node, make):
+    children = node.children
+    if children:
+        children = [_copy_tree(child, make) for child in children]
+    return make(node.tag, node.value, children, node.props)
+
+
+def _allocated(make):
+    """Returns what make() allocates, in bytes, and keeps it until then."""
+    before = tracemalloc.get_traced_memory()[0]
+    kept = make()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    del kept
+    return allocated
+
+
+def measure_memory(pages=100, shape="mixed", seed=0):
+    """
+    Holds the ASTs of a whole synthetic site in memory, as watch mode
+    and parallel builds do, and returns (html nodes, bytes per html node,
+    layouts), where layouts maps "__slots__" and "__dict__" to the bytes
+    per html node and per TextNode of that layout alone (strings shared).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        files = generate_corpus(Path(tmp), pages, shape, seed)
+        documents = [path.read_text() for path in files]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [markdown_to_html_node(document) for document in documents]
+    html_bytes = tracemalloc.get_traced_memory()[0] - before
+    node_count = sum(count_nodes(node) for node in nodes)
+
+    # Both layouts copy the same trees, so they differ only by the layout
+    layouts = {}
+    for name, node_class, text_class in [
+            ("__slots__", _SlottedNode, _SlottedTextNode),
+            ("__dict__", _DictNode, _DictTextNode)]:
+        tree_bytes = _allocated(
+            lambda: [_copy_tree(node, node_class) for node in nodes])
+        text_bytes = _allocated(
+            lambda: [text_class("text", TextType.LINK, "/url")
+                     for _ in range(10000)])
+        layouts[name] = (tree_bytes / node_count, text_bytes / 10000)
+    tracemalloc.stop()
+    return node_count, html_bytes / node_count, layouts
+
+
+def format_results(results):
+    lines = [f"{'benchmark':<36}{'time':>12}{'MB/s':>10}{'pages/s':>10}"]
+    for name, seconds, megabytes, pages in results:
+        pages_per_second = f"{pages / seconds:10.1f}" if pages else f"{'-':>10}"
+        lines.append(f"{name:<36}{seconds * 1000:9.1f} ms"
+                     f"{megabytes / seconds:10.2f}{pages_per_second}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the site generator.")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--shape", choices=SHAPES, default="mixed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", "-j", type=int, default=1)
+    parser.add_argument("--memory", action="store_true",
+                        help="measure the memory held by the parsed ASTs instead")
+    args = parser.parse_args()
+
+    if args.memory:
+        nodes, per_node, layouts = measure_memory(args.pages, args.shape,
+                                                  args.seed)
+        print(f"--> {nodes} html nodes held in memory")
+        print(f"{per_node:.1f} bytes per html node (including its strings)")
+        slotted, unslotted = layouts["__slots__"], layouts["__dict__"]
+        for index, name in enumerate(["html node", "TextNode"]):
+            print(f"{name}: {slotted[index]:.1f} bytes with __slots__, "
+                  f"{unslotted[index]:.1f} with a __dict__ "
+                  f"({unslotted[index] - slotted[index]:.1f} bytes saved, "
+                  f"{1 - slotted[index] / unslotted[index]:.0%})")
+        return
+
+    print(f"--> Benchmarking {args.pages} '{args.shape}' pages (seed {args.seed})")
+    results = run_benchmarks(args.pages, args.shape, args.seed, args.repeat,
+                             args.jobs)
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+from pathlib import Path
+from asset_sync import SYNC_MODES
+from search_index import SEARCH_DIR
+from staging import SWAP_MODES
+
+
+DEFAULT_CONFIG_FILE = "site.toml"
+BUILD_MODES = ["full", "incremental"]
+
+# TOML table -> setting -> type of its value
+SETTINGS = {
+    "paths": {
+        "static": str,
+        "content": str,
+        "output": str,
+        "template": str,
+        "cache_dir": str,
+    },
+    "build": {
+        "basepath": str,
+        "jobs": int,
+        "mode": str,
+        "cache": bool,
+        "parse_cache": bool,
+        "sync_assets": str,
+        "swap": str,
+        "async_io": bool,
+        "fingerprint": bool,
+        "precompress": bool,
+        "minify": bool,
+        "search": bool,
+    },
+    "site": {
+        "url": str,
+        "title": str,
+        "author": str,
+    },
+}
+
+PATH_SETTINGS = set(SETTINGS["paths"])
+
+# Tables whose settings are prefixed by the table name: site.url -> site_url
+PREFIXED_TABLES = {"site"}
+
+
+def setting_name(table, name):
+    """Returns the SiteConfig attribute of a setting of a TOML table."""
+    return f"{table}_{name}" if table in PREFIXED_TABLES else name
+
+
+class SiteConfig():
+    """
+    Where the site is read from and written to, and how it is built.
+
+    Settings come from the defaults below, then the TOML config file,
+    then the command line. Relative paths are resolved against the
+    directory of the config file that set them, or the working directory.
+    """
+    def __init__(self):
+        self.static = Path("static").absolute()
+        self.content = Path("content").absolute()
+        self.output = Path("docs").absolute()
+        self.template = Path("template.html").absolute()
+        self.cache_dir = None
+        self.basepath = "/"
+        self.jobs = 1
+        self.mode = "full"
+        self.cache = False
+        self.parse_cache = False
+        self.sync_assets = None
+        self.swap = "rename"
+        self.async_io = False
+        self.fingerprint = False
+        self.precompress = False
+        self.minify = False
+        self.search = False
+        self.site_url = None
+        self.site_title = None
+        self.site_author = None
+
+    def update(self, settings, base_dir="."):
+        for name, value in settings.items():
+            if value is None:
+                continue
+            if name in PATH_SETTINGS:
+                value = (Path(base_dir) / value).absolute()
+            setattr(self, name, value)
+        for name, choices in [("mode", BUILD_MODES), ("swap", SWAP_MODES),
+                              ("sync_assets", SYNC_MODES)]:
+            value = getattr(self, name)
+            if value is not None and value not in choices:
+                raise ValueError(f"Unknown {name}: {value} "
+                                 f"(expected one of {', '.join(choices)})")
+        if self.search:
+            # The index replaces its whole directory on every build
+            for src_dir in self.source_dirs():
+                if (src_dir / SEARCH_DIR).exists():
+                    raise ValueError(f"{src_dir / SEARCH_DIR} would be overwritten "
+                                     f"by the search index written to {SEARCH_DIR}/")
+        return self
+
+    @property
+    def incremental(self):
+        return self.mode == "incremental"
+
+    @property
+    def manifest_path(self):
+        return self.output.parent / ".build-manifest.json"
+
+    @property
+    def graph_path(self):
+        return self.output.parent / ".build-deps.json"
+
+    @property
+    def asset_hashes_path(self):
+        return self.output.parent / ".build-assets.json"
+
+    @property
+    def precompress_path(self):
+        return self.output.parent / ".build-precompress.json"
+
+    @property
+    def page_index_path(self):
+        return self.output.parent / ".build-pages.json"
+
+    @property
+    def search_terms_path(self):
+        return self.output.parent / ".build-search"
+
+    @property
+    def default_cache_dir(self):
+        return self.output.parent / ".build-cache"
+
+    def source_dirs(self):
+        """The existing directories the site is built from, static files first."""
+        dirs = []
+        for path in [self.static, self.content]:
+            if path.is_dir() and path.resolve() not in [d.resolve() for d in dirs]:
+                dirs.append(path)
+        return dirs
+
+
+def read_config_file(path):
+    """Returns the settings of a TOML config file, by setting name."""
+    try:
+        # Only loaded when there is a config file to read
+        import tomllib
+    except ImportError:
+        # Python < 3.11: only the command line settings are available
+        raise ValueError(f"Reading {path} requires Python 3.11 (tomllib)")
+    with open(path, "rb") as file:
+        tables = tomllib.load(file)
+
+    settings = {}
+    for table, values in tables.items():
+        if table not in SETTINGS or not isinstance(values, dict):
+            raise ValueError(f"Unknown section [{table}] in {path}")
+        for name, value in values.items():
+            expected = SETTINGS[table].get(name)
+            if expected is None:
+                raise ValueError(f"Unknown setting {table}.{name} in {path}")
+            if not isinstance(value, expected) or (
+                    expected is int and isinstance(value, bool)):
+                raise ValueError(f"{table}.{name} in {path} must be "
+                                 f"a{'n' if expected is int else ''} "
+                                 f"{expected.__name__}")
+            settings[setting_name(table, name)] = value
+    return settings
+
+
+def add_config_arguments(parser):
+    """Adds the options locating the config file and the site's paths."""
+    parser.add_argument("--config", metavar="PATH",
+                        help="TOML file with [paths], [build] and [site] settings "
+                             f"(default: {DEFAULT_CONFIG_FILE}, if it exists)")
+    parser.add_argument("--static", metavar="DIR",
+                        help="static files (and pages) to publish "
+                             "(default: static)")
+    parser.add_argument("--content", metavar="DIR",
+                        help="markdown pages to render (default: content)")
+    parser.add_argument("--output", metavar="DIR",
+                        help="where the site is written (default: docs)")
+    parser.add_argument("--template", metavar="PATH",
+                        help="page template (default: template.html)")
+
+
+def config_from_args(args):
+    """
+    Returns the SiteConfig for parsed arguments: the defaults, updated by
+    the config file, then by the options given on the command line.
+    """
+    config = SiteConfig()
+    config_path = args.config
+    if config_path is None and os.path.exists(DEFAULT_CONFIG_FILE):
+        config_path = DEFAULT_CONFIG_FILE
+    if config_path is not None:
+        config.update(read_config_file(config_path),
+                      os.path.dirname(os.path.abspath(config_path)))
+
+    settings = {}
+    for table, names in SETTINGS.items():
+        for name in names:
+            name = setting_name(table, name)
+            settings[name] = getattr(args, name, None)
+    return config.update(settings)
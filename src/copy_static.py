@@ -1,24 +1,255 @@
 from shutil import copy2
-from generate_content import generate_pages
+from asset_sync import sync_asset
+from staging import detach_output
+import fingerprint
+import minify
+import search_index
+from profiling import add_stages, record_work_item, stage
+import render_cache
+
+
+# The parser, the renderer and the pools are imported when there is work
+# for them, so a no-op incremental build never loads them
+
+
+def copy_static_content(src_dir, dest_dir, path_template, basepath, manifest=None,
+                        jobs=1, profile=None, asset_mode=None, graph=None,
+                        async_io=False, page_index=None, outputs=None):
+    """
+    Copies src_dir into dest_dir, rendering every markdown file to html.
+
+    The tree is walked first to collect the work items; with jobs > 1
+    pages are rendered in a process pool (markdown parsing is CPU-bound)
+    and other files are copied in a thread pool (copy2 is I/O-bound).
+    With a BuildProfile, the timings of every page and file are added to it.
+    With an asset_mode (see asset_sync.SYNC_MODES), files already identical
+    in dest_dir are skipped instead of being copied again.
+    With a DependencyGraph, the inputs of every output are recorded in it.
+    With a PageIndex, the title and summary of every page are recorded in it.
+    With async_io (and a single job), sources are read ahead and outputs
+    written in the background while pages render, see IOPipeline.
+    With fingerprints enabled, assets are also copied to their fingerprinted
+    names; dest_dir must then be the root of the site.
+    With an outputs set, the path of every output of src_dir is added to
+    it, whether it is rebuilt or skipped.
+    """
+    profiled = profile is not None
+    pages, assets = collect_work_items(src_dir, dest_dir)
+    assets += fingerprint.fingerprinted_items(assets, dest_dir)
+    if outputs is not None:
+        outputs.update(str(dest_item) for _, dest_item in pages + assets)
+
+    if manifest is not None:
+        pages = _stale_items(manifest, pages, manifest.page_entry,
+                             [graph, page_index])
+        assets = _stale_items(manifest, assets, manifest.asset_entry, [graph])
+
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        cache_settings = render_cache.active_settings()
+        fingerprints = fingerprint.active_fingerprints()
+        with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                                 initargs=(cache_settings, fingerprints,
+                                           minify.minify_enabled(),
+                                           search_index.search_terms_dir())) as processes, \
+             ThreadPoolExecutor(jobs) as threads:
+            futures = [processes.submit(build_step, profiled, "page", render_page,
+                                        src, dest, path_template, basepath)
+                       for src, dest in pages]
+            futures += [threads.submit(build_step, profiled, "file", copy_asset,
+                                       src, dest, asset_mode)
+                        for src, dest in assets]
+            results = [future.result() for future in futures]
+    else:
+        if async_io:
+            results = render_pages_pipelined(pages, path_template, basepath,
+                                             profiled)
+        else:
+            results = [build_step(profiled, "page", render_page,
+                                  src, dest, path_template, basepath)
+                       for src, dest in pages]
+        results += [build_step(profiled, "file", copy_asset, src, dest,
+                               asset_mode)
+                    for src, dest in assets]
+
+    for index, (src_item, dest_item) in enumerate(pages + assets):
+        (error, value), record = results[index]
+        if record is not None:
+            profile.add(record)
+        if error is not None:
+            print(error)
+            if manifest is not None:
+                manifest.invalidate(dest_item)
+        is_page = index < len(pages)
+        if manifest is not None and is_page and value:
+            manifest.record_references(dest_item, value["references"])
+        if graph is not None:
+            if is_page:
+                references = value["references"] if value else []
+                graph.record_page(dest_item, src_item, path_template, references,
+                                  dest_dir)
+            else:
+                graph.record_file(dest_item, src_item)
+        if page_index is not None and is_page:
+            if value:
+                page_index.record_page(dest_item, src_item, value)
+            else:
+                page_index.keep(dest_item)
+
+
+def collect_work_items(src_dir, dest_dir, pages=None, assets=None):
+    """
+    Walks src_dir, creating the matching directories under dest_dir,
+    and returns two lists of (source, destination) pairs:
+    the markdown pages to render and the other files to copy.
+    """
+    if pages is None:
+        pages, assets = [], []
 
-def copy_static_content(src_dir, dest_dir, path_template, basepath):
     for src_item in src_dir.iterdir():
         dest_item = dest_dir / src_item.name
 
-        try:
-            if src_item.is_dir():
-                dest_item.mkdir(exist_ok=True)
-                copy_static_content(src_item, dest_item, path_template, basepath)
-            elif src_item.suffix.lower() == ".md":
-                new_extension = ".html"
-                new_html = dest_item.with_suffix(new_extension)
-                generate_pages(src_item, path_template, new_html, basepath)
-            else:
-                copy2(src_item, dest_item)
-
-        except PermissionError:
-            print(f"Permission denied for {src_item}")
-        except FileNotFoundError:
-            print(f"file not found: {src_item}")
-        except Exception as e:
-            print(f"Error with {src_item}: {e}")
\ No newline at end of file
+        if src_item.is_dir():
+            error, _ = run_work_item(src_item, dest_item.mkdir, exist_ok=True)
+            if error is not None:
+                print(error)
+                continue
+            collect_work_items(src_item, dest_item, pages, assets)
+        elif src_item.suffix.lower() == ".md":
+            new_extension = ".html"
+            pages.append((src_item, dest_item.with_suffix(new_extension)))
+        else:
+            assets.append((src_item, dest_item))
+
+    return pages, assets
+
+
+def build_step(profiled, kind, func, src_item, *args):
+    """
+    Runs func(src_item, *args) and returns its (error, value) result along
+    with its timings, or None for the timings when the build isn't profiled.
+    """
+    if not profiled:
+        return func(src_item, *args), None
+    return record_work_item(src_item, kind, func, src_item, *args)
+
+
+def render_pages_pipelined(pages, path_template, basepath, profiled):
+    """
+    Renders pages in this thread while an IOPipeline reads the next
+    sources and writes the finished pages, and returns the same
+    results as build_step would for each page.
+    """
+    from io_pipeline import IOPipeline
+
+    pipeline = IOPipeline(profiled=profiled)
+    results = []
+    positions = {}
+    for src_item, dest_item, text in pipeline.read_ahead(pages):
+        (error, value), record = build_step(profiled, "page", render_prefetched,
+                                            src_item, text, path_template,
+                                            dest_item, basepath)
+        if error is None:
+            fragments, value = value
+            pipeline.write(src_item, dest_item, fragments)
+        positions[src_item] = len(results)
+        results.append(((error, value), record))
+
+    for src_item, exception in pipeline.close():
+        position = positions[src_item]
+        record = results[position][1]
+        results[position] = ((error_message(src_item, exception), None), record)
+
+    # Reads and writes ran in the pipeline's threads, outside the records
+    for src_item, stages in pipeline.stages.items():
+        add_stages(results[positions[src_item]][1], stages)
+    return results
+
+
+def render_prefetched(src_item, text, path_template, dest_item, basepath):
+    from generate_content import render_page_fragments
+
+    def render():
+        detach_output(dest_item)
+        return render_page_fragments(src_item, text.result(), path_template,
+                                     dest_item, basepath)
+    return run_work_item(src_item, render)
+
+
+def render_page(src_item, dest_item, path_template, basepath):
+    return run_work_item(src_item, _write_page, src_item, path_template,
+                         dest_item, basepath)
+
+
+def copy_asset(src_item, dest_item, asset_mode=None):
+    with stage("copy"):
+        if asset_mode is None:
+            return run_work_item(src_item, _copy_file, src_item, dest_item)
+        return run_work_item(src_item, sync_asset, src_item, dest_item, asset_mode)
+
+
+def run_work_item(src_item, func, *args, **kwargs):
+    """
+    Runs one build step for src_item and returns (error, value):
+    the error message to report, or None if it succeeded,
+    and the value returned by the step.
+    """
+    try:
+        return None, func(*args, **kwargs)
+    except Exception as e:
+        return error_message(src_item, e), None
+
+
+def error_message(src_item, exception):
+    """The message reported when building src_item raised exception."""
+    if isinstance(exception, PermissionError):
+        return f"Permission denied for {src_item}"
+    if isinstance(exception, FileNotFoundError):
+        return f"file not found: {src_item}"
+    return f"Error with {src_item}: {exception}"
+
+
+def _write_page(src_item, path_template, dest_item, basepath):
+    from generate_content import generate_pages
+
+    detach_output(dest_item)
+    return generate_pages(src_item, path_template, dest_item, basepath)
+
+
+def _copy_file(src_item, dest_item):
+    detach_output(dest_item)
+    return copy2(src_item, dest_item)
+
+
+def _init_worker(cache_settings, fingerprints, minified, search_terms):
+    render_cache.enable_settings(cache_settings)
+    if fingerprints:
+        fingerprint.enable_fingerprints(fingerprints)
+    if minified:
+        minify.enable_minify()
+    if search_terms is not None:
+        search_index.enable_search_index(search_terms)
+
+
+def _stale_items(manifest, items, make_entry, records):
+    """
+    Returns the items that must be rebuilt; what the records (graph,
+    page index) hold about the others is kept.
+    """
+    stale = []
+    for src_item, dest_item in items:
+        if _is_fresh(manifest, src_item, dest_item, make_entry):
+            for record in records:
+                if record is not None:
+                    record.keep(dest_item)
+        else:
+            stale.append((src_item, dest_item))
+    return stale
+
+
+def _is_fresh(manifest, src_item, dest_item, make_entry):
+    try:
+        return manifest.is_fresh(dest_item, make_entry(src_item, dest_item))
+    except OSError:
+        # Let the build step report the problem
+        return False
@@ -0,0 +1,129 @@
+import json
+import os
+import re
+from manifest import relocate_path
+
+
+# Root-relative urls in the html of a page, quoted or not (minified)
+REFERENCE_PATTERN = re.compile(r"""(?:href|src)=["']?(/[^"'\s>]*)""")
+
+
+def find_references(html, basepath="/"):
+    """
+    Returns the root-relative urls linked or embedded by an html fragment
+    whose urls were prefixed with basepath, as urls relative to the root
+    of the site.
+    """
+    if '="/' not in html and "=/" not in html and "='/" not in html:
+        return []
+    urls = REFERENCE_PATTERN.findall(html)
+    if basepath == "/":
+        return urls
+    return ["/" + url[len(basepath):] for url in urls if url.startswith(basepath)]
+
+
+class DependencyGraph():
+    """
+    Records, for every output of the build, the inputs it depends on:
+
+    - "source": the markdown page or static file it is built from
+    - "template": the template wrapped around a page
+    - "references": the outputs a page links to or embeds (href/src)
+
+    Only the source and the template change the bytes of an output;
+    a referenced file can change without the page being rebuilt.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}
+        self.outputs = {}
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                self.previous = json.load(file).get("outputs", {})
+        except (FileNotFoundError, ValueError):
+            self.previous = {}
+        return self
+
+    def save(self):
+        with open(self.path, "w") as file:
+            json.dump({"outputs": self.outputs}, file, indent=1, sort_keys=True)
+
+    def record_page(self, dest_path, src_path, template_path, references, dest_dir):
+        self.outputs[_key(dest_path)] = {
+            "source": _key(src_path),
+            "template": _key(template_path),
+            "references": sorted({url_to_output(url, dest_dir)
+                                  for url in references}),
+        }
+
+    def record_file(self, dest_path, src_path):
+        self.outputs[_key(dest_path)] = {"source": _key(src_path)}
+
+    def keep(self, dest_path):
+        """Carries over the edges of an output this build didn't rebuild."""
+        key = _key(dest_path)
+        if key in self.previous:
+            self.outputs[key] = self.previous[key]
+
+    def relocate(self, old_root, new_root):
+        """Moves the outputs recorded under old_root to new_root."""
+        old_root, new_root = _key(old_root), _key(new_root)
+        self.previous = _relocate_outputs(self.previous, old_root, new_root)
+        self.outputs = _relocate_outputs(self.outputs, old_root, new_root)
+
+    def why(self, output):
+        """Returns the (kind, input) pairs output depends on."""
+        entry = self.outputs.get(_key(output)) or self.previous.get(_key(output))
+        if entry is None:
+            return []
+        edges = [("source", entry["source"])]
+        if entry.get("template"):
+            edges.append(("template", entry["template"]))
+        edges += [("reference", reference)
+                  for reference in entry.get("references", [])]
+        return edges
+
+    def affected(self, path):
+        """
+        Returns the (kind, output) pairs that depend on path, which is an
+        input (source or template) or an output referenced by pages.
+        """
+        outputs = self.outputs or self.previous
+        path = _key(path)
+        produced = [output for output, entry in outputs.items()
+                    if entry["source"] == path]
+        edges = [("rebuild", output) for output in sorted(produced)]
+        edges += [("rebuild", output) for output, entry in sorted(outputs.items())
+                  if entry.get("template") == path]
+
+        # Pages embedding or linking to what path is built into
+        targets = set(produced) | {path}
+        edges += [("references", output) for output, entry in sorted(outputs.items())
+                  if targets.intersection(entry.get("references", []))]
+        return edges
+
+
+def url_to_output(url, dest_dir):
+    """Maps a root-relative url to the output file it is served from."""
+    path = url.split("#")[0].split("?")[0].lstrip("/")
+    output = os.path.join(dest_dir, path)
+    if url.endswith("/") or not os.path.splitext(path)[1]:
+        output = os.path.join(output, "index.html")
+    return _key(output)
+
+
+def _relocate_outputs(outputs, old_root, new_root):
+    relocated = {}
+    for output, entry in outputs.items():
+        if "references" in entry:
+            entry = dict(entry, references=[
+                relocate_path(reference, old_root, new_root)
+                for reference in entry["references"]])
+        relocated[relocate_path(output, old_root, new_root)] = entry
+    return relocated
+
+
+def _key(path):
+    return os.path.abspath(path)
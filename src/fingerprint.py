@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from manifest import hash_file
+
+
+# Hex digits of the content hash put in fingerprinted names
+HASH_LENGTH = 10
+
+# Entry points keep their names: pages are linked to from outside the site
+UNFINGERPRINTED_EXTENSIONS = {".md", ".html", ".htm"}
+
+# Fingerprints used by this process: url -> fingerprinted url
+_active_fingerprints = {}
+_active_version = None
+
+
+class AssetHashes():
+    """
+    On-disk cache of the content hash of every static file, keyed by its
+    path and trusted as long as its size and mtime are unchanged, so
+    unchanged assets aren't read again on every build.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}
+        self.current = {}
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                self.previous = json.load(file).get("files", {})
+        except (FileNotFoundError, ValueError):
+            self.previous = {}
+        return self
+
+    def save(self):
+        with open(self.path, "w") as file:
+            json.dump({"files": self.current}, file, indent=1, sort_keys=True)
+
+    def hash(self, src_path):
+        key = os.path.abspath(src_path)
+        stat = os.stat(src_path)
+        entry = self.previous.get(key)
+        if (entry is None or entry["size"] != stat.st_size
+                or entry["mtime_ns"] != stat.st_mtime_ns):
+            entry = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "hash": hash_file(src_path),
+            }
+        self.current[key] = entry
+        return entry["hash"]
+
+
+def fingerprinted_name(name, digest):
+    """Returns name.<hash>.ext for a file name and its content hash."""
+    base, extension = os.path.splitext(name)
+    return f"{base}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def fingerprint_assets(src_dirs, hashes):
+    """
+    Returns {url: fingerprinted url} for the static files of src_dirs,
+    as root-relative urls. A file of a later directory replaces the
+    file of the same name in an earlier one, as it does in the build.
+    """
+    fingerprints = {}
+    for src_dir in src_dirs:
+        for root, _, files in os.walk(src_dir):
+            relative = os.path.relpath(root, src_dir).replace(os.sep, "/")
+            prefix = "/" if relative == "." else f"/{relative}/"
+            for name in files:
+                extension = os.path.splitext(name)[1].lower()
+                if name.startswith(".") or extension in UNFINGERPRINTED_EXTENSIONS:
+                    continue
+                digest = hashes.hash(os.path.join(root, name))
+                fingerprints[prefix + name] = prefix + fingerprinted_name(name, digest)
+    return fingerprints
+
+
+def fingerprinted_items(assets, dest_dir):
+    """
+    Returns the (source, destination) pairs writing the fingerprinted
+    copies of assets, the files copied into dest_dir, the root of the site.
+    """
+    items = []
+    for src_item, dest_item in assets:
+        url = "/" + os.path.relpath(dest_item, dest_dir).replace(os.sep, "/")
+        fingerprinted = _active_fingerprints.get(url)
+        if fingerprinted is not None:
+            items.append((src_item, dest_item.with_name(fingerprinted.rsplit("/", 1)[1])))
+    return items
+
+
+def enable_fingerprints(fingerprints):
+    """Makes the urls written by this process point at fingerprinted assets."""
+    global _active_fingerprints, _active_version
+    _active_fingerprints = dict(fingerprints)
+    encoded = json.dumps(_active_fingerprints, sort_keys=True).encode()
+    _active_version = hashlib.sha256(encoded).hexdigest()
+
+
+def disable_fingerprints():
+    global _active_fingerprints, _active_version
+    _active_fingerprints = {}
+    _active_version = None
+
+
+def active_fingerprints():
+    return _active_fingerprints
+
+
+def fingerprints_version():
+    """A hash of the active fingerprints, or None: changes whenever an asset does."""
+    return _active_version
@@ -1,5 +1,19 @@
-from inline_markdown import markdown_to_html_node
+from functools import lru_cache
+import hashlib
+import io
+from depgraph import find_references
+from fingerprint import fingerprints_version
+from minify import minify_enabled, minify_template
+from htmlnode import DEFERRED_URLS, RawNode, rewrite_urls
+from inline_markdown import (BlockType, blocks_to_html_node, classify_block,
+                             iter_blocks, text_to_textnodes)
+from profiling import stage, timed_call, timed_iter
+from render_cache import active_page_cache
+from search_index import record_page_terms, search_index_enabled
+from textnode import TextType
 import os
+import re
+
 
 def extract_title(markdown):
     lines = markdown.splitlines()
@@ -11,25 +25,220 @@ def extract_title(markdown):
     raise ValueError("No title found.")
 
 
-def generate_pages(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    print()
-    
-    with open(from_path) as file:
-        markdown_content = file.read()
-        
+def extract_block_title(block):
+    """
+    Returns the title if this block holds the first H1 of the page,
+    following the same rule as extract_title, or None.
+    """
+    for line in block.splitlines():
+        if line.startswith("# "):
+            return block.split("# ", 1)[1].strip()
+    return None
+
+
+# Longest summary kept for a page, in characters
+SUMMARY_LENGTH = 280
+
+
+def extract_block_summary(block):
+    """
+    Returns the plain text of a paragraph block if it holds some text
+    besides links and images (a "Back Home" link is no summary), or None.
+    """
+    block_type, content = classify_block(block)
+    if block_type != BlockType.PARAGRAPH:
+        return None
+    nodes = text_to_textnodes(content)
+    if not any(node.text_type == TextType.TEXT and node.text.strip()
+               for node in nodes):
+        return None
+    text = " ".join("".join(node.text for node in nodes
+                            if node.text_type != TextType.IMAGE).split())
+    if len(text) > SUMMARY_LENGTH:
+        text = text[:SUMMARY_LENGTH - 1].rsplit(" ", 1)[0] + "…"
+    return text
+
+
+def read_page(from_path, markdown=None, plain_text=None):
+    """
+    Parses the markdown file at from_path block by block, as the file
+    is read line by line, and returns its title, its HTMLNode and its
+    summary (the text of its first paragraph, or "").
+    The title and the summary are captured during the same pass, as is
+    the plain text of the page if plain_text is a list to append it to.
+    If its markdown was already read (prefetched), it is parsed instead.
+    """
+    title = None
+    summary = None
+
+    def blocks(lines):
+        nonlocal title, summary
+        for block in timed_iter("markdown_to_blocks", iter_blocks(lines)):
+            if title is None:
+                title = extract_block_title(block)
+            elif summary is None:
+                summary = extract_block_summary(block)
+            yield block
+
+    if markdown is None:
+        with open(from_path) as file:
+            node = blocks_to_html_node(blocks(timed_iter("read", file)), plain_text)
+    else:
+        node = blocks_to_html_node(blocks(io.StringIO(markdown)), plain_text)
+    if title is None:
+        raise ValueError("No title found.")
+    return title, node, summary or ""
+
+
+def parse_page(from_path, markdown=None, plain_text=None):
+    """
+    Returns the title, the HTMLNode and the summary of the page at
+    from_path. With a page cache, a source parsed before is not parsed
+    again: its cached body html comes back as a single RawNode, and its
+    cached text is appended to plain_text.
+    """
+    cache = active_page_cache()
+    if cache is None:
+        return read_page(from_path, markdown, plain_text)
+
+    if markdown is None:
+        with open(from_path) as file:
+            markdown = file.read()
+    if DEFERRED_URLS in markdown:
+        # A NUL in the text couldn't be told apart from the url markers
+        # of the cached html
+        return read_page(from_path, markdown, plain_text)
+    key = hashlib.sha256(markdown.encode()).hexdigest()
+    if minify_enabled():
+        key += ".min"
+    cached = cache.load(key)
+    if cached is not None:
+        title, body, summary, text = cached
+        if plain_text is not None:
+            plain_text.append(text)
+        return title, RawNode(body), summary
+
+    # The text is cached whether or not this build indexes it
+    page_text = []
+    title, node, summary = read_page(from_path, markdown, page_text)
+    with stage("to_html"):
+        body = node.to_html(DEFERRED_URLS)
+    text = "\n".join(page_text)
+    cache.store(key, title, body, summary, text)
+    if plain_text is not None:
+        plain_text.append(text)
+    return title, RawNode(body), summary
+
+
+def apply_basepath(html, basepath):
+    """Points the root-relative urls of html at basepath."""
+    return rewrite_urls(html, basepath)
+
+
+class Template():
+    """
+    A page template split once into its static segments and the
+    {{ Title }} / {{ Content }} slots between them, so that writing
+    a page only streams its title and body between ready-made segments.
+    """
+    placeholder = re.compile(r"\{\{ (Title|Content) \}\}")
+
+    def __init__(self, text, basepath="/", minify=False):
+        # The static parts of the template are rewritten for the basepath
+        # (and minified) here once instead of on every rendered page
+        if minify:
+            text = minify_template(text)
+        self.segments = []
+        self.slots = []
+        start = 0
+        for match in self.placeholder.finditer(text):
+            self.segments.append(apply_basepath(text[start:match.start()], basepath))
+            self.slots.append(match.group(1))
+            start = match.end()
+        self.segments.append(apply_basepath(text[start:], basepath))
+
+    def write(self, write, title, node, basepath, references=None):
+        """
+        Streams the page for node into write, without building
+        the body html or the final document as one string.
+        The root-relative urls of the body are added to references.
+        """
+        # The urls of the body are prefixed as the nodes are serialized
+        def write_content(fragment):
+            if references is not None:
+                references.extend(find_references(fragment, basepath))
+            write(fragment)
+
+        with stage("template"):
+            write(self.segments[0])
+            for slot, segment in zip(self.slots, self.segments[1:]):
+                if slot == "Title":
+                    write(title)
+                else:
+                    with stage("to_html"):
+                        node.write_html(write_content, basepath)
+                write(segment)
+
+
+def load_template(template_path, basepath):
+    """
+    Returns the compiled template for template_path.
+    The file is only read again when it changes on disk
+    (or when the asset fingerprints its urls point at change).
+    """
+    mtime = os.stat(template_path).st_mtime_ns
+    return _load_template(str(template_path), basepath, mtime,
+                          fingerprints_version(), minify_enabled())
+
+
+@lru_cache(maxsize=8)
+def _load_template(template_path, basepath, mtime, fingerprints, minify):
     with open(template_path) as file:
-        template_content = file.read()
+        return Template(file.read(), basepath, minify)
 
-    title = extract_title(markdown_content)
-    node = markdown_to_html_node(markdown_content)
-    html = node.to_html()
-    new_template = template_content.replace("{{ Title }}", title).replace(
-        "{{ Content }}", html)
 
-    final_template = new_template.replace('href="/', f'href="{basepath}').replace(
-        'src="/', f'src="{basepath}')
+def generate_pages(from_path, template_path, dest_path, basepath):
+    """
+    Renders the markdown page at from_path into dest_path and returns
+    what the build records about it: its title, its summary and the
+    root-relative urls it links to or embeds ("references").
+    """
+    template, title, node, summary = _parse_for_render(
+        from_path, None, template_path, dest_path, basepath)
 
+    references = []
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
     with open(dest_path, 'w') as file:
-        file.write(final_template)
\ No newline at end of file
+        template.write(timed_call("write", file.write), title, node, basepath,
+                       references)
+    return {"title": title, "summary": summary, "references": references}
+
+
+def render_page_fragments(from_path, markdown, template_path, dest_path, basepath):
+    """
+    Renders markdown already read from from_path and returns the html
+    fragments of the page, to be written to dest_path by the caller,
+    and what the build records about it, as generate_pages does.
+    """
+    template, title, node, summary = _parse_for_render(
+        from_path, markdown, template_path, dest_path, basepath)
+
+    fragments = []
+    references = []
+    template.write(fragments.append, title, node, basepath, references)
+    return fragments, {"title": title, "summary": summary,
+                       "references": references}
+
+
+def _parse_for_render(from_path, markdown, template_path, dest_path, basepath):
+    # What rendering a page needs before its html is written anywhere
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    print()
+
+    with stage("template"):
+        template = load_template(template_path, basepath)
+    plain_text = [] if search_index_enabled() else None
+    title, node, summary = parse_page(from_path, markdown, plain_text)
+    if plain_text is not None:
+        record_page_terms(from_path, plain_text)
+    return template, title, node, summary
@@ -1,32 +1,145 @@
+import re
+from fingerprint import active_fingerprints
+from minify import (UNQUOTED_VALUE_PATTERN, attribute, collapse_whitespace,
+                    minify_enabled)
+
+
+# Shared by every LeafNode, which can never have children
+EMPTY_CHILDREN = ()
+
+# Attributes holding a url that the basepath applies to
+URL_ATTRIBUTES = {"href", "src", "poster"}
+URL_ATTRIBUTE_PATTERN = re.compile(
+    r"""(\s(?:href|src|poster)=)(["']?)(/(?!/)[^"'\s>]*)""")
+SRCSET_PATTERN = re.compile(r"""(\ssrcset=)(["'])(.*?)\2""", re.DOTALL)
+
+
+def prefix_url(url, basepath):
+    """
+    Points a root-relative url at basepath, and at the fingerprinted
+    copy of the asset it names if there is one; other urls are left alone.
+    """
+    if url.startswith("/") and not url.startswith("//"):
+        url = active_fingerprints().get(url, url)
+        return basepath + url[1:]
+    return url
+
+
+def prefix_srcset(srcset, basepath):
+    """Applies the basepath to every candidate url of a srcset."""
+    candidates = []
+    for candidate in srcset.split(","):
+        stripped = candidate.lstrip()
+        # "url 2x": the descriptor follows the url after whitespace
+        url = stripped.split(maxsplit=1)[0] if stripped else ""
+        candidates.append(candidate[:len(candidate) - len(stripped)]
+                          + prefix_url(url, basepath) + stripped[len(url):])
+    return ",".join(candidates)
+
+
+# Passed as the basepath, marks the url attributes instead of prefixing
+# them, so html rendered for a cache suits any basepath (see RawNode):
+# each is written as DEFERRED_URLS + key + KEY_END + value + DEFERRED_URLS
+DEFERRED_URLS = "\x00"
+KEY_END = "\x01"
+
+
+def attribute_html(key, value, basepath, minify):
+    """Returns ' key="value"' as a node writes it for basepath."""
+    if basepath is not None:
+        if key in URL_ATTRIBUTES:
+            value = prefix_url(value, basepath)
+        elif key == "srcset":
+            value = prefix_srcset(value, basepath)
+    if minify:
+        return attribute(key, value)
+    return f' {key}="{value}"'
+
+
+def rewrite_urls(html, basepath):
+    """
+    Applies the basepath (and the asset fingerprints) to the href, src,
+    poster and srcset attributes of raw html, single-, double- or unquoted.
+    """
+    if basepath == "/" and not active_fingerprints():
+        return html
+    html = URL_ATTRIBUTE_PATTERN.sub(
+        lambda match: _prefix_url_attribute(match, basepath), html)
+    return SRCSET_PATTERN.sub(
+        lambda match: match.group(1) + match.group(2)
+        + prefix_srcset(match.group(3), basepath) + match.group(2), html)
+
+
+def _prefix_url_attribute(match, basepath):
+    key, quote, url = match.groups()
+    url = prefix_url(url, basepath)
+    if not quote and not UNQUOTED_VALUE_PATTERN.fullmatch(url):
+        # Unquoted by the minifier, but the basepath needs quotes
+        return f'{key}"{url}"'
+    return key + quote + url
+
+
 class HTMLNode():
+    # Pages allocate tens of thousands of nodes: no per-instance __dict__
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
         self.children = children
         self.props = props
 
-    def to_html(self):
-        # Ensure all subclasses implement their own to_html()
+    def to_html(self, basepath=None):
+        """Returns the node as an html string."""
+        fragments = []
+        self.write_html(fragments.append, basepath)
+        return "".join(fragments)
+
+    def write_html(self, write, basepath=None, preformatted=False):
+        """
+        Serializes the node by passing its html fragments, in order,
+        to write (e.g. list.append or the write method of an open file).
+        With a basepath, root-relative urls are written already prefixed.
+        When minifying, text is collapsed unless it is preformatted
+        (inside a <pre>).
+        """
+        # Ensure all subclasses implement their own write_html()
         raise NotImplementedError("to_html method not implemented")
     
-    def props_to_html(self):
+    def props_to_html(self, basepath=None):
         """Returns a string that represents the HTML attributes of the node."""
         if self.props is None:
             return ""       
-        string_attributes = ""
+        minify = minify_enabled()
+        if not minify and (basepath is None or
+                           (basepath == "/" and not active_fingerprints())):
+            return "".join([f' {key}="{value}"' for key, value in self.props.items()])
+        attributes = []
         for key, value in self.props.items():
-            string_attributes += f" {key}" + "=" + f'"{value}"'
-        return string_attributes
+            if basepath == DEFERRED_URLS and (key in URL_ATTRIBUTES
+                                              or key == "srcset"):
+                attributes.append(f"{DEFERRED_URLS}{key}{KEY_END}{value}"
+                                  f"{DEFERRED_URLS}")
+            elif basepath == DEFERRED_URLS:
+                attributes.append(attribute_html(key, value, None, minify))
+            else:
+                attributes.append(attribute_html(key, value, basepath, minify))
+        return "".join(attributes)
     
     def __repr__(self):
         return f'HTMLNode({self.tag}, {self.value}, children: {self.children}, {self.props})'
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         if value is None:
             raise ValueError("The LeafNode subclass requires a value.")
-        super().__init__(tag=tag, value=value, props=props, children=[])
+        self.tag = tag
+        self.value = value
+        self.children = EMPTY_CHILDREN
+        self.props = props
 
     def add_child(self, child):
         raise Exception("LeafNode can not have children!")
@@ -34,34 +147,77 @@ class LeafNode(HTMLNode):
     def add_children(self, children):
         raise Exception("LeafNode can not have children!")
     
-    def to_html(self):
+    def to_html(self, basepath=None):
         """Returns a leaf node as an html string"""
+        return self.leaf_html(basepath, minify_enabled())
+
+    def write_html(self, write, basepath=None, preformatted=False):
+        write(self.leaf_html(basepath, minify_enabled() and not preformatted))
+
+    def leaf_html(self, basepath, collapse):
+        value = self.value
+        if collapse:
+            value = collapse_whitespace(value)
         if self.tag is None:
-            return self.value
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+            return value
+        return f"<{self.tag}{self.props_to_html(basepath)}>{value}</{self.tag}>"
     
     def __repr__(self):
         return f'LeafNode({self.tag}, {self.value}, {self.props})'
+
+
+class RawNode(LeafNode):
+    """
+    A leaf holding html that was already rendered, such as a cached block.
+    If it was rendered with the DEFERRED_URLS basepath, its url attributes
+    are written for the basepath exactly as the nodes would write them.
+    """
+    __slots__ = ()
+
+    def __init__(self, html):
+        super().__init__(None, html)
+
+    def leaf_html(self, basepath, collapse):
+        # Cached html was rendered (and minified, if so) when it was cached
+        # Rendered into a page that is itself cached: keep the markers
+        if basepath == DEFERRED_URLS or DEFERRED_URLS not in self.value:
+            return self.value
+        parts = self.value.split(DEFERRED_URLS)
+        minify = minify_enabled()
+        for index in range(1, len(parts), 2):
+            key, value = parts[index].split(KEY_END, 1)
+            parts[index] = attribute_html(key, value, basepath, minify)
+        return "".join(parts)
+
+    def __repr__(self):
+        return f'RawNode({self.value})'
     
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag=tag, children=children, props=props)
+        self.tag = tag
+        self.value = None
+        self.children = children
+        self.props = props
 
-    def to_html(self):
-        """ Returns a string representing the HTML tag of the node and its children."""
+    def write_html(self, write, basepath=None, preformatted=False):
+        """
+        Writes the opening tag, the children and the closing tag
+        in a single traversal, so no subtree string is ever rebuilt.
+        """
         if self.tag is None:
             raise ValueError("The ParentNode subclass requires a tag.")
         if self.children is None:
             raise ValueError("The ParentNode subclass must have children.")
 
-        concat_str = ""       
+        # Whitespace is content inside <pre>
+        preformatted = preformatted or self.tag == "pre"
+        write(f'<{self.tag}{self.props_to_html(basepath)}>')
         for child in self.children:
-            concat_str += child.to_html()
-        if self.props:
-            props_str = self.props_to_html()
-            return f'<{self.tag}{props_str}>{concat_str}</{self.tag}>'
-        return f'<{self.tag}>{concat_str}</{self.tag}>'
+            child.write_html(write, basepath, preformatted)
+        write(f'</{self.tag}>')
     
     def __repr__(self):
         return f'ParentNode({self.tag}, children: {self.children}, {self.props})'
@@ -1,6 +1,10 @@
+from bisect import bisect_left
 from enum import Enum
+import io
 
-from htmlnode import ParentNode
+from htmlnode import DEFERRED_URLS, ParentNode, RawNode
+from profiling import stage
+from render_cache import active_cache
 from textnode import TextNode, TextType, text_node_to_html_node
 import re
 
@@ -14,10 +18,143 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 
-def text_to_textnodes(text):
+def text_to_textnodes(text, legacy=False):
     """
     Converts a raw string of markdown-flavored text 
     into a list of TextNode objects.
+
+    legacy=True runs the original chain of split_nodes_* passes
+    in full, so both can be compared.
+    """
+    if legacy:
+        return text_to_textnodes_legacy(text)
+    return split_nodes_skipping_idle_passes(text)
+
+
+def split_nodes_skipping_idle_passes(text):
+    """
+    Runs the passes of text_to_textnodes_legacy, in the same order,
+    but skips the image and link passes known to leave the nodes as
+    they are: the legacy chain re-splits the whole node list once per
+    node, which is quadratic in the number of spans.
+
+    A pass is idle when no text node holds the characters its
+    extract_markdown_* function reacts to (it would find no match and
+    raise nothing), or when it already ran on the same nodes without
+    changing them. Either way the nodes (and the errors) are the same
+    as the legacy ones, and only the passes that split something cost
+    a scan of the nodes.
+    """
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+
+    # One pass per node of the delimiter split, chosen by its text
+    passes = [_split_images if "![" in node.text else _split_links
+              for node in nodes]
+    idle = _idle_passes(nodes)
+    for split in passes:
+        if split in idle:
+            continue
+        split_nodes = split(nodes)
+        if split_nodes == nodes:
+            # The same nodes would give the same result again
+            idle.add(split)
+        else:
+            nodes = split_nodes
+            idle = _idle_passes(nodes)
+    return nodes
+
+
+def _idle_passes(nodes):
+    """
+    Returns the passes that can't split or reject any of the text nodes:
+    the image pass only acts on text holding "![" or "](", the link
+    pass on text holding "[" or "](".
+    """
+    images = links = False
+    for node in nodes:
+        if node.text_type == TextType.TEXT:
+            if "](" in node.text:
+                return set()
+            images = images or "![" in node.text
+            links = links or "[" in node.text
+    idle = set()
+    if not images:
+        idle.add(_split_images)
+    if not links:
+        idle.add(_split_links)
+    return idle
+
+
+def _split_images(nodes):
+    return split_nodes_spans(nodes, extract_markdown_images, TextType.IMAGE)
+
+
+def _split_links(nodes):
+    return split_nodes_spans(nodes, extract_markdown_links, TextType.LINK)
+
+
+# Every literal "![alt](url)" or "[text](url)" in a text, overlapping or
+# not: the brackets and parens end the parts, so one can start anywhere
+SPAN_PATTERNS = {
+    TextType.IMAGE: ("!", re.compile(r"(?=(!\[[^\[\]]*\]\([^()]*\)))")),
+    TextType.LINK: ("", re.compile(r"(?=(\[[^\[\]]*\]\([^()]*\)))")),
+}
+
+
+def split_nodes_spans(old_nodes, extract, text_type):
+    """
+    Returns what split_nodes_image (text_type IMAGE, extract_markdown_images)
+    or split_nodes_link (LINK, extract_markdown_links) returns, raising the
+    same errors, in time linear in the length of the text.
+
+    Those split the rest of the text on each span in turn, which rescans
+    it once per span. Here the spans are located in one scan, and the
+    text between them is sliced as the legacy splits would cut it.
+    """
+    prefix, pattern = SPAN_PATTERNS[text_type]
+    final_nodes = []
+    for old_node in old_nodes:
+        if old_node.text_type != TextType.TEXT:
+            final_nodes.append(old_node)
+            continue
+        extracted = extract(old_node.text)
+        if not extracted:
+            final_nodes.append(old_node)
+            continue
+
+        text = old_node.text
+        occurrences = {}
+        for match in pattern.finditer(text):
+            occurrences.setdefault(match.group(1), []).append(match.start())
+        # The legacy splits keep text[start:end] as the text left to split
+        start, end = 0, len(text)
+        for label, url in extracted:
+            markup = f"{prefix}[{label}]({url})"
+            positions = occurrences.get(markup, [])
+            index = bisect_left(positions, start)
+            if index == len(positions) or positions[index] + len(markup) > end:
+                # split() found nothing, so sections[1] didn't exist
+                raise IndexError("list index out of range")
+            if positions[index] > start:
+                final_nodes.append(TextNode(text[start:positions[index]],
+                                            TextType.TEXT))
+            final_nodes.append(TextNode(label, text_type, url))
+            start = positions[index] + len(markup)
+            # sections[1] ends where the same markup occurs again
+            index = bisect_left(positions, start, index + 1)
+            if index < len(positions) and positions[index] + len(markup) <= end:
+                end = positions[index]
+        if start < end:
+            final_nodes.append(TextNode(text[start:end], TextType.TEXT))
+    return final_nodes
+
+
+def text_to_textnodes_legacy(text):
+    """
+    Converts text with one split_nodes_* pass per inline construct.
     """
     initial_TextNode = TextNode(text, TextType.TEXT)
     new_TextNode = split_nodes_delimiter([initial_TextNode], "**", TextType.BOLD)
@@ -188,41 +325,101 @@ def markdown_to_blocks(markdown):
     split_markdown = markdown.split("\n\n")
     blocks = [block.strip() for block in split_markdown if block != ""]
     return blocks
+
+
+def iter_blocks(lines):
+    """
+    Yields the stripped, non-empty blocks of a document given as an
+    iterable of lines (e.g. an open file), as soon as each one ends.
+
+    A blank line ends a block, which is where markdown_to_blocks
+    splits on "\n\n".
+    """
+    block_lines = []
+    for line in lines:
+        if line == "\n":
+            block = "".join(block_lines).strip()
+            block_lines = []
+            if block:
+                yield block
+        else:
+            block_lines.append(line)
+    block = "".join(block_lines).strip()
+    if block:
+        yield block
     
 
+# Patterns used to classify blocks and extract their content,
+# compiled once at import instead of on every block
+HEADING_PATTERN = re.compile(r"^#{1,6} \S.+", re.MULTILINE)
+HEADING_CONTENT_PATTERN = re.compile(r"^#{1,6} +(.+)", re.MULTILINE)
+CODE_CONTENT_PATTERN = re.compile(r"^```(.*?)```$", re.DOTALL)
+QUOTE_CONTENT_PATTERN = re.compile(r"^> (.*)", re.MULTILINE)
+UNORDERED_LIST_CONTENT_PATTERN = re.compile(r"^- (.*)", re.MULTILINE)
+ORDERED_LIST_CONTENT_PATTERN = re.compile(r"^[0-9]+\. (.+)", re.MULTILINE)
+ORDERED_LIST_MARKERS = set("0123456789")
+
+
 def block_to_block_type(block):
     """
     Takes a single block of markdown text as input 
     
     and returns the BlockType representing the type of block it is.
     """
+    return classify_block(block)[0]
 
-    if re.findall(r"^#{1,6} \S.+", block, re.MULTILINE):
-        return BlockType.HEADING
-    elif re.findall(r"^```.*?```$", block, re.DOTALL):
-        return BlockType.CODE
-    elif re.findall(r"^> ?.*", block, re.MULTILINE):
-        return BlockType.QUOTE
-    elif re.findall(r"^- .+", block, re.MULTILINE):
-        return BlockType.UNORDERED_LIST
-    elif re.findall(r"^[0-9]+\. .+", block, re.MULTILINE):
-        return BlockType.ORDERED_LIST
-    else:
-        return BlockType.PARAGRAPH
 
+def classify_block(block):
+    """
+    Returns the BlockType of a block together with its content,
+    as get_content would extract it.
 
-def text_to_children(text):
+    The first character of each line is checked before any regex runs,
+    so plain paragraphs never reach one, and for the other types the
+    content match doubles as the classification.
+    """
+    line_starts = {line[:1] for line in block.split("\n")}
+
+    if "#" in line_starts and HEADING_PATTERN.search(block):
+        return BlockType.HEADING, HEADING_CONTENT_PATTERN.findall(block)
+    if block.startswith("```"):
+        content = CODE_CONTENT_PATTERN.findall(block)
+        if content:
+            return BlockType.CODE, content[0].lstrip()
+    if ">" in line_starts:
+        return BlockType.QUOTE, QUOTE_CONTENT_PATTERN.findall(block)
+    if "-" in line_starts:
+        content = UNORDERED_LIST_CONTENT_PATTERN.findall(block)
+        # "^- .+" matches exactly when one captured item is not empty
+        if any(content):
+            return BlockType.UNORDERED_LIST, content
+    if not line_starts.isdisjoint(ORDERED_LIST_MARKERS):
+        content = ORDERED_LIST_CONTENT_PATTERN.findall(block)
+        if content:
+            return BlockType.ORDERED_LIST, content
+    return BlockType.PARAGRAPH, block.replace("\n", " ")
+
+
+def text_to_children(text, plain_text=None):
     """
-    Creates a list of children based on the inline markdown syntax
+    Creates a list of children based on the inline markdown syntax.
+    If plain_text is a list, the text the reader sees is appended to it.
     """
     new_text_nodes = text_to_textnodes(text)
     list_children = []
     for node in new_text_nodes:
         new_child = text_node_to_html_node(node)
         list_children.append(new_child)
+    if plain_text is not None:
+        plain_text.append(textnodes_to_plain_text(new_text_nodes))
     return list_children
 
 
+def textnodes_to_plain_text(nodes):
+    """Returns the text of TextNodes as read on the page: images are left out."""
+    return "".join(node.text for node in nodes if node.text_type != TextType.IMAGE)
+
+
 def get_heading_html(heading):
     if heading.startswith("# "):
         return "h1"
@@ -245,87 +442,136 @@ def get_content(blockType, block):
     if blockType == BlockType.PARAGRAPH:
         return block.replace("\n", " ")
     elif blockType == BlockType.HEADING:
-        return re.findall(r"^#{1,6} +(.+)", block, re.MULTILINE)
+        return HEADING_CONTENT_PATTERN.findall(block)
     elif blockType == BlockType.CODE:
-        content = re.findall(r"^```(.*?)```$", block, re.DOTALL)
+        content = CODE_CONTENT_PATTERN.findall(block)
         raw_content = content[0]
         return raw_content.lstrip()
     elif blockType == BlockType.QUOTE:
-        return re.findall(r"^> (.*)", block, re.MULTILINE)
+        return QUOTE_CONTENT_PATTERN.findall(block)
     elif blockType == BlockType.UNORDERED_LIST:
-        return re.findall(r"^- (.*)", block, re.MULTILINE)
+        return UNORDERED_LIST_CONTENT_PATTERN.findall(block)
     elif blockType == BlockType.ORDERED_LIST:
-        return re.findall(r"^[0-9]+\. (.+)", block, re.MULTILINE)
+        return ORDERED_LIST_CONTENT_PATTERN.findall(block)
 
 
-def block_to_ParentNode(blockType, block):
+def block_to_ParentNode(blockType, block, content=None, plain_text=None):
     """
     Takes a block of markdown and its block type, 
-    extracts the content and returns a ParentNode
+    extracts the content (unless it was already extracted
+    by classify_block) and returns a ParentNode.
+    The plain text of the block is appended to plain_text, if given.
     """
+    if content is None:
+        content = get_content(blockType, block)
 
     if blockType == BlockType.PARAGRAPH:
-        text = get_content(blockType, block)
-        children_list = text_to_children(text)
+        children_list = text_to_children(content, plain_text)
         return ParentNode("p", children_list)
     
     elif blockType == BlockType.HEADING:
         tag = get_heading_html(block)
-        heading_text = get_content(blockType, block)
-        children_list = text_to_children(heading_text[0])
+        children_list = text_to_children(content[0], plain_text)
         return ParentNode(tag, children_list)
     
     elif blockType == BlockType.CODE:
         children_list = []
-        cleaned_text = get_content(blockType, block)
-        node = TextNode(cleaned_text, TextType.CODE)
+        node = TextNode(content, TextType.CODE)
+        if plain_text is not None:
+            plain_text.append(content)
         children = text_node_to_html_node(node)
         children_list.append(children)
         return ParentNode("pre", children_list)
     
     elif blockType == BlockType.QUOTE:
-        content = get_content(blockType, block)
         for i in range(len(content) - 1):
             content[i] = content[i] + " "
         children_list = []
         for element in content:
-            nodes = text_to_children(element)
+            nodes = text_to_children(element, plain_text)
             for node in nodes:
                 children_list.append(node)
         return ParentNode("blockquote", children_list)
     
     elif blockType == BlockType.UNORDERED_LIST:
-        content = get_content(blockType, block)
         children_list = []
         for item in content:
-            child = text_to_children(item)
+            child = text_to_children(item, plain_text)
             nested_parent = ParentNode("li", child)
             children_list.append(nested_parent)
         return ParentNode("ul", children_list)
     
     elif blockType == BlockType.ORDERED_LIST:
-        content = get_content(blockType, block)
         children_list = []
         for item in content:
-            child = text_to_children(item)
+            child = text_to_children(item, plain_text)
             nested_parent = ParentNode("li", child)
             children_list.append(nested_parent)
         return ParentNode("ol", children_list)
 
         
-def markdown_to_html_node(markdown):
+def markdown_to_html_node(markdown, plain_text=None):
     """ 
-    Converts a full markdown document into a single parent HTMLNode
+    Converts a full markdown document into a single parent HTMLNode.
+    If plain_text is a list, the text of the document (without markup)
+    is appended to it, one string per paragraph, heading, item or code block.
+    """
+    return blocks_to_html_node(iter_blocks(io.StringIO(markdown)), plain_text)
+
+
+def blocks_to_html_node(blocks_markdown, plain_text=None):
+    """
+    Converts an iterable of markdown blocks into a single parent HTMLNode,
+    consuming the blocks one at a time
     """
-    blocks_markdown = markdown_to_blocks(markdown)
+    cache = active_cache()
     children_list = []
     for block in blocks_markdown:
         if block != "":
-            block_type = block_to_block_type(block) 
-            parent = block_to_ParentNode(block_type, block)
-            if isinstance(parent, list):
-                children_list.extend(parent)
-            else:
-                children_list.append(parent)
+            # A NUL in the text couldn't be told apart from the url
+            # markers of cached html
+            if cache is not None and DEFERRED_URLS not in block:
+                children_list.append(cached_block_node(cache, block, plain_text))
+                continue
+            children_list.extend(block_to_nodes(block, plain_text))
     return ParentNode("div", children_list)
 
+
+def block_to_nodes(block, plain_text=None):
+    """Returns the list of HTMLNodes a single block renders to"""
+    with stage("block classification"):
+        block_type, content = classify_block(block)
+    with stage("inline parsing"):
+        parent = block_to_ParentNode(block_type, block, content, plain_text)
+    if isinstance(parent, list):
+        return parent
+    return [parent]
+
+
+def cached_block_node(cache, block, plain_text=None):
+    """
+    Returns the block as a RawNode of html, rendering it
+    only if the render cache doesn't already hold its html
+    """
+    html = cache.get(block)
+    if html is None:
+        nodes = block_to_nodes(block, plain_text)
+        html = "".join([node.to_html(DEFERRED_URLS) for node in nodes])
+        cache.put(block, html)
+    elif plain_text is not None:
+        # Only the html is cached: the text needs the inline scan alone
+        plain_text.extend(block_plain_text(block))
+    return RawNode(html)
+
+
+def block_plain_text(block):
+    """Returns the plain text of a block as block_to_ParentNode captures it."""
+    block_type, content = classify_block(block)
+    if block_type == BlockType.CODE:
+        return [content]
+    if block_type == BlockType.PARAGRAPH:
+        content = [content]
+    elif block_type == BlockType.HEADING:
+        content = content[:1]
+    return [textnodes_to_plain_text(text_to_textnodes(text)) for text in content]
+
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from profiling import StageRecorder
+
+
+class IOPipeline():
+    """
+    Thread-pool-backed I/O around a renderer running in the caller's thread.
+
+    Sources are read ahead, up to prefetch files in flight, while the
+    current page renders. Outputs are queued and written in the
+    background; once max_pending_writes are queued the batch is flushed
+    before more are accepted, which bounds memory and concurrency.
+    Each output directory is only created once.
+    With profiled, the time spent reading and writing each item is
+    recorded in stages, as {src_item: {"read": timings, "write": timings}}.
+    """
+    def __init__(self, workers=8, prefetch=16, max_pending_writes=32,
+                 profiled=False):
+        self.executor = ThreadPoolExecutor(workers)
+        self.profiled = profiled
+        self.stages = {}
+        self.prefetch = prefetch
+        self.max_pending_writes = max_pending_writes
+        self.pending = deque()
+        self.errors = []
+        self.created_dirs = set()
+        self.lock = threading.Lock()
+
+    def read_ahead(self, items):
+        """
+        Yields (src_item, dest_item, future) for every item, where the
+        future holds the text of src_item, read in the background.
+        """
+        window = deque()
+        for src_item, dest_item in items:
+            window.append((src_item, dest_item,
+                           self.executor.submit(self._timed, src_item, "read",
+                                                _read_text, src_item)))
+            if len(window) > self.prefetch:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+    def write(self, src_item, dest_path, fragments):
+        """Queues the fragments to be written to dest_path."""
+        future = self.executor.submit(self._timed, src_item, "write",
+                                      self._write, dest_path, fragments)
+        self.pending.append((src_item, future))
+        if len(self.pending) >= self.max_pending_writes:
+            self.flush()
+
+    def flush(self):
+        """Waits for the queued writes and keeps the ones that failed."""
+        while self.pending:
+            src_item, future = self.pending.popleft()
+            exception = future.exception()
+            if exception is not None:
+                self.errors.append((src_item, exception))
+
+    def close(self):
+        """
+        Flushes the remaining writes and returns the (src_item, exception)
+        pairs of every write that failed.
+        """
+        self.flush()
+        self.executor.shutdown()
+        return self.errors
+
+    def ensure_dir(self, path):
+        with self.lock:
+            if path in self.created_dirs:
+                return
+        os.makedirs(path, exist_ok=True)
+        with self.lock:
+            self.created_dirs.add(path)
+
+    def _timed(self, src_item, name, func, *args):
+        if not self.profiled:
+            return func(*args)
+        # Timed in this worker thread, so its CPU time is the step's own
+        recorder = StageRecorder(src_item, "page")
+        recorder.start(name)
+        try:
+            return func(*args)
+        finally:
+            recorder.stop()
+            with self.lock:
+                self.stages.setdefault(src_item, {}).update(recorder.stages)
+
+    def _write(self, dest_path, fragments):
+        self.ensure_dir(os.path.dirname(dest_path))
+        with open(dest_path, "w") as file:
+            file.writelines(fragments)
+
+
+def _read_text(path):
+    with open(path) as file:
+        return file.read()
@@ -0,0 +1,178 @@
+import argparse
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
+
+from config import add_config_arguments, config_from_args
+from depgraph import find_references
+from inline_markdown import BlockType, classify_block, iter_blocks, text_to_textnodes
+from search_index import SEARCH_DIR
+from textnode import TextType
+
+
+def site_index(src_dirs):
+    """
+    Returns the set of output paths, relative to the root of the site,
+    that the build produces from the files of src_dirs.
+    """
+    outputs = set()
+    for src_dir in src_dirs:
+        for root, _, files in os.walk(src_dir):
+            relative = os.path.relpath(root, src_dir)
+            for name in files:
+                path = os.path.normpath(os.path.join(relative, name))
+                if os.path.splitext(name)[1].lower() == ".md":
+                    path = os.path.splitext(path)[0] + ".html"
+                outputs.add(path.replace(os.sep, "/"))
+    return outputs
+
+
+def generated_outputs(config):
+    """
+    Returns the output paths, relative to the root of the site, that the
+    build writes besides the files of the sources, as config enables them.
+    """
+    outputs = set()
+    if config.site_url:
+        outputs.add("sitemap.xml")
+        if any((src_dir / "blog").is_dir() for src_dir in config.source_dirs()):
+            outputs.add("blog/feed.xml")
+    if config.search:
+        # The shards are fetched through index.json, not linked to
+        outputs.update(f"{SEARCH_DIR}/{name}" for name in ["index.json", "docs.json"])
+    return outputs
+
+
+def inline_texts(block):
+    """
+    Yields the inline markdown of a block, split as block_to_ParentNode
+    splits it. Code blocks hold no links.
+    """
+    block_type, content = classify_block(block)
+    if block_type == BlockType.PARAGRAPH:
+        yield content
+    elif block_type == BlockType.HEADING:
+        yield content[0]
+    elif block_type != BlockType.CODE:
+        yield from content
+
+
+def page_references(src_path):
+    """
+    Parses the markdown page at src_path down to its text nodes only
+    and returns the (attribute, url) pairs of its links and images.
+    """
+    references = []
+    with open(src_path) as file:
+        for block in iter_blocks(file):
+            for text in inline_texts(block):
+                for node in text_to_textnodes(text):
+                    if node.text_type == TextType.LINK:
+                        references.append(("href", node.url))
+                    elif node.text_type == TextType.IMAGE:
+                        references.append(("src", node.url))
+    return references
+
+
+def resolve_url(url, page_output):
+    """
+    Returns the output path an internal url points to, relative to the
+    root of the site, or None for external urls and in-page anchors.
+    """
+    url = url.split("#")[0].split("?")[0]
+    if not url or url.startswith("//") or ":" in url.split("/")[0]:
+        return None
+    if url.startswith("/"):
+        path = url.lstrip("/")
+    else:
+        path = posixpath.join(posixpath.dirname(page_output), url)
+    path = posixpath.normpath(unquote(path))
+    if path == ".":
+        path = ""
+    if url.endswith("/") or not posixpath.splitext(path)[1]:
+        path = posixpath.join(path, "index.html")
+    return path
+
+
+def check_site(src_dirs, template_path=None, jobs=1, generated=()):
+    """
+    Checks every internal href and src of the pages of src_dirs (and of
+    the template) against the outputs of the site, those of src_dirs and
+    the generated ones (see generated_outputs), without rendering anything.
+    Returns (pages, references, problems), where pages doesn't count the
+    template and problems are (source, message) pairs.
+    """
+    outputs = site_index(src_dirs) | set(generated)
+    pages = []
+    for src_dir in src_dirs:
+        for root, _, files in os.walk(src_dir):
+            for name in files:
+                if os.path.splitext(name)[1].lower() == ".md":
+                    src_path = os.path.join(root, name)
+                    output = os.path.relpath(src_path, src_dir)
+                    output = os.path.splitext(output)[0].replace(os.sep, "/") + ".html"
+                    pages.append((src_path, output))
+
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = [executor.submit(_page_references, src_path)
+                       for src_path, _ in pages]
+            results = [future.result() for future in futures]
+    else:
+        results = [_page_references(src_path) for src_path, _ in pages]
+
+    page_count = len(pages)
+    if template_path is not None:
+        with open(template_path) as file:
+            template_urls = find_references(file.read())
+        # The template is rendered at every depth: only its root-relative urls count
+        pages.append((str(template_path), ""))
+        results.append((None, [("url", url) for url in template_urls]))
+
+    problems = []
+    references = 0
+    for (src_path, page_output), (error, page_refs) in zip(pages, results):
+        if error is not None:
+            problems.append((src_path, f"could not be parsed: {error}"))
+            continue
+        for attribute, url in page_refs:
+            references += 1
+            target = resolve_url(url, page_output)
+            if target is not None and target not in outputs:
+                problems.append((src_path, f'broken {attribute} "{url}"'))
+    return page_count, references, problems
+
+
+def _page_references(src_path):
+    try:
+        return None, page_references(src_path)
+    except Exception as e:
+        return str(e), None
+
+
+def check_command(argv):
+    """
+    Parses the arguments of `main.py check`, prints the broken references
+    and returns the exit status of the command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py check",
+        description="Report internal links and images that point nowhere.")
+    parser.add_argument("--jobs", "-j", type=int, metavar="N",
+                        help="parse pages in N worker processes")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        config = config_from_args(args)
+    except (OSError, ValueError) as e:
+        parser.exit(2, f"Invalid configuration: {e}\n")
+
+    pages, references, problems = check_site(config.source_dirs(),
+                                             config.template, config.jobs,
+                                             generated_outputs(config))
+    for src_path, message in problems:
+        print(f"{src_path}: {message}")
+    print(f"--> Checked {references} references in {pages} pages and the "
+          f"template: {len(problems)} problem(s)")
+    return 1 if problems else 0
@@ -1,32 +1,249 @@
-from shutil import rmtree
-from pathlib import Path
-from copy_static import copy_static_content
+import argparse
 import sys
+from config import BUILD_MODES, add_config_arguments, config_from_args
+from asset_sync import SYNC_MODES
+from staging import SWAP_MODES
 
 
-dir_path_static = Path("/home/onodac/workspace/github.com/CamilleOnoda/static-site-generator/static")
-dir_path_public = Path("/home/onodac/workspace/github.com/CamilleOnoda/static-site-generator/docs")
-dir_path_content = Path("/home/onodac/workspace/github.com/CamilleOnoda/static-site-generator/content")
-path_template = "./template.html"
-default_basepath = "/"
+# The build engine (parser, renderer, caches) is imported by build() only,
+# so --help, --why and --affected start without loading it
 
 
-def main():
-    basepath = default_basepath
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Build the static site.",
+        epilog="Other commands: `main.py serve --help`, `main.py check --help`.")
+    parser.add_argument("basepath", nargs="?", default=None,
+                        help="url prefix of the site (default: /)")
+    add_config_arguments(parser)
+    parser.add_argument("--mode", choices=BUILD_MODES,
+                        help="full rebuilds everything, incremental only the "
+                             "outputs whose inputs changed (default: full)")
+    parser.add_argument("--incremental", action="store_const", dest="mode",
+                        const="incremental", help="same as --mode incremental")
+    parser.add_argument("--jobs", "-j", type=int, metavar="N",
+                        help="render pages in N worker processes")
+    parser.add_argument("--async-io", action="store_true", default=None,
+                        help="read sources ahead and write pages in the "
+                             "background (single job builds)")
+    parser.add_argument("--cache", action="store_true", default=None,
+                        help="reuse the rendered html of identical blocks")
+    parser.add_argument("--parse-cache", action="store_true", default=None,
+                        help="reuse parsed pages, so template or basepath "
+                             "changes only re-run templating")
+    parser.add_argument("--cache-dir", metavar="PATH",
+                        help="where the on-disk caches live, which also keeps "
+                             "the block cache between builds (default for "
+                             "--parse-cache: .build-cache next to the output)")
+    parser.add_argument("--sync-assets", choices=SYNC_MODES, metavar="MODE",
+                        help="reuse the previous output and skip static files "
+                             "that are already identical; MODE is one of "
+                             + ", ".join(SYNC_MODES))
+    parser.add_argument("--swap", choices=SWAP_MODES,
+                        help="how the staged build replaces the output: rename "
+                             "the directory (atomic on Linux, elsewhere the "
+                             "output is briefly missing), or flip the output "
+                             "as a symlink to it (default: rename)")
+    parser.add_argument("--fingerprint", action="store_true", default=None,
+                        help="also publish static files as name.<hash>.ext "
+                             "and point the pages and the template at them")
+    parser.add_argument("--minify", action="store_true", default=None,
+                        help="collapse the whitespace of the template and the "
+                             "pages (not <pre>) and drop redundant quotes")
+    parser.add_argument("--search", action="store_true", default=None,
+                        help="write a client-side search index of the pages "
+                             "to search/, which no source directory may hold")
+    parser.add_argument("--precompress", action="store_true", default=None,
+                        help="write .gz (and .br, with the brotli module) "
+                             "siblings of the text outputs")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="public url of the site, e.g. https://example.com: "
+                             "enables sitemap.xml and the blog/feed.xml feed")
+    parser.add_argument("--why", metavar="OUTPUT",
+                        help="print the inputs OUTPUT was built from, then exit")
+    parser.add_argument("--affected", metavar="PATH",
+                        help="print the outputs that depend on PATH, then exit")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-stage timings of the slowest pages")
+    parser.add_argument("--profile-json", metavar="PATH",
+                        help="also write the profile as JSON to PATH")
+    return parser.parse_args(argv)
+
+
+def query_graph(config, args):
+    """Prints the edges of the dependency graph asked for by --why or --affected."""
+    from depgraph import DependencyGraph
+
+    graph = DependencyGraph(config.graph_path).load()
+    if args.why:
+        edges = graph.why(args.why)
+    else:
+        edges = graph.affected(args.affected)
+    for kind, path in edges:
+        print(f"{kind:<12} {path}")
+    if not edges:
+        print("No dependencies recorded (run a build first).")
+
+
+def build(config, profile=None):
+    """Builds the site described by config into its output directory."""
+    from copy_static import copy_static_content
+    from depgraph import DependencyGraph, find_references
+    from fingerprint import (AssetHashes, active_fingerprints, enable_fingerprints,
+                             fingerprint_assets)
+    from manifest import (COMPRESSED_SUFFIXES, BuildManifest, hash_file,
+                          relocate_path)
+    from minify import enable_minify
+    from page_index import PageIndex
+    from search_index import enable_search_index
+    from staging import StagedOutput, prune_outputs
+    import render_cache
+
+    graph = DependencyGraph(config.graph_path).load()
+    page_index = PageIndex(config.page_index_path).load()
 
-    if dir_path_public.exists():
-        rmtree(dir_path_public)
+    cache = None
+    if config.cache or config.cache_dir:
+        cache = render_cache.enable_cache(cache_dir=config.cache_dir)
+    page_cache = None
+    if config.parse_cache:
+        page_cache = render_cache.enable_page_cache(config.cache_dir or
+                                                    config.default_cache_dir)
 
-    print("--> Creating public directory...")
-    dir_path_public.mkdir(parents=True, exist_ok=True)
+    if config.minify:
+        enable_minify()
+    if config.search:
+        enable_search_index(config.search_terms_path)
+    if config.fingerprint:
+        hashes = AssetHashes(config.asset_hashes_path).load()
+        enable_fingerprints(fingerprint_assets(config.source_dirs(), hashes))
+        hashes.save()
+
+    manifest = None
+    if config.incremental:
+        fingerprints = active_fingerprints() if config.fingerprint else None
+        with open(config.template) as file:
+            template_urls = find_references(file.read())
+        manifest = BuildManifest(config.manifest_path, hash_file(config.template),
+                                 config.basepath, fingerprints, config.minify,
+                                 template_urls).load()
+
+    # Build next to the output, reusing its files when the build can skip
+    # them, and swap the result in once it is complete
+    print("--> Staging public directory...")
+    staged = StagedOutput(config.output, config.swap)
+    reuse = config.incremental or config.sync_assets is not None
+    build_dir = staged.prepare(reuse=reuse)
+    graph.relocate(config.output, build_dir)
+    page_index.relocate(config.output, build_dir)
+    if manifest is not None:
+        manifest.relocate(config.output, build_dir)
 
     print("--> Copying static content to public content...")
-    copy_static_content(dir_path_static, dir_path_public, path_template, basepath)
+    outputs = set()
+    for src_dir in config.source_dirs():
+        copy_static_content(src_dir, build_dir, config.template, config.basepath,
+                            manifest, config.jobs, profile, config.sync_assets,
+                            graph, config.async_io, page_index, outputs)
+    graph.relocate(build_dir, config.output)
+    graph.save()
+
+    if config.site_url:
+        from sitemap import write_feed, write_sitemap
+
+        print("--> Writing the sitemap and the feed...")
+        entries = page_index.entries(build_dir)
+        write_sitemap(build_dir / "sitemap.xml", entries, config.site_url,
+                      config.basepath)
+        outputs.add(str(build_dir / "sitemap.xml"))
+        if (build_dir / "blog").is_dir():
+            write_feed(build_dir / "blog" / "feed.xml", entries, config.site_url,
+                       config.basepath, "blog", config.site_title,
+                       config.site_author)
+            outputs.add(str(build_dir / "blog" / "feed.xml"))
+    if config.search:
+        from search_index import SEARCH_DIR, write_search_index
+
+        print("--> Writing the search index...")
+        documents, terms, parsed = write_search_index(
+            build_dir, page_index.entries(build_dir), config.search_terms_path,
+            config.basepath)
+        print(f"Indexed {terms} term(s) of {documents} page(s)"
+              + (f", parsing {parsed} page(s) rendered without it" if parsed else ""))
+        outputs.update(str(path) for path in (build_dir / SEARCH_DIR).iterdir())
+    if reuse:
+        # The previous output may hold the outputs of deleted sources
+        # Siblings of live outputs are only kept for precompress to check
+        keep_suffixes = COMPRESSED_SUFFIXES if config.precompress else ()
+        for output in prune_outputs(build_dir, outputs, keep_suffixes):
+            output = relocate_path(output, build_dir, config.output)
+            print(f"Removed stale output {output}")
+    page_index.relocate(build_dir, config.output)
+    page_index.save()
+
+    if manifest is not None:
+        for output in manifest.remove_stale_outputs():
+            output = relocate_path(output, build_dir, config.output)
+            print(f"Removed stale output {output}")
+        manifest.relocate(build_dir, config.output)
+        manifest.save()
+
+    if config.precompress:
+        from precompress import precompress_tree
+
+        print("--> Precompressing text outputs...")
+        written, errors = precompress_tree(build_dir, config.jobs,
+                                           config.precompress_path)
+        for error in errors:
+            print(error)
+        print(f"Wrote {written} compressed file(s)")
+
+    print("--> Swapping in the new public directory...")
+    if staged.commit() is not None:
+        print("--> Removing the previous public directory in the background...")
+
+    if cache is not None:
+        cache.prune()
+    if page_cache is not None:
+        page_cache.prune()
+
+
+def main():
+    if sys.argv[1:2] == ["serve"]:
+        from serve import serve_command
+        serve_command(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["check"]:
+        from link_check import check_command
+        sys.exit(check_command(sys.argv[2:]))
+
+    args = parse_args(sys.argv[1:])
+    try:
+        config = config_from_args(args)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Invalid configuration: {e}")
+
+    if args.why or args.affected:
+        query_graph(config, args)
+        return
+
+    profile = None
+    if args.profile or args.profile_json:
+        from profiling import BuildProfile
+        profile = BuildProfile()
+
+    build(config, profile)
 
     print("--> Generating content...")
     print("Success!")
 
+    if profile is not None:
+        profile.finish()
+        print(profile.report())
+        if args.profile_json:
+            profile.dump_json(args.profile_json)
+
 
-main()
+# Guarded so the worker processes of --jobs can import this module
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+
+
+# Precompressed siblings written next to an output, see precompress
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+
+def hash_file(path):
+    """
+    Returns the sha256 hex digest of a file, read in chunks
+    so large images don't have to fit in memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest():
+    """
+    On-disk record of what produced each output file of the previous build.
+
+    Every output path maps to a small dict of its inputs (source hash,
+    template hash, basepath, whether it was minified and, for a page,
+    the fingerprinted url of every url it references). An output whose
+    recorded inputs are identical to the current ones, and which still
+    exists on disk, doesn't need to be rebuilt.
+
+    fingerprints maps urls to fingerprinted urls, or is None when the
+    build doesn't fingerprint assets; template_urls are the urls of the
+    template, which every page references.
+    """
+    def __init__(self, path, template_hash=None, basepath=None,
+                 fingerprints=None, minify=False, template_urls=()):
+        self.path = path
+        self.template_hash = template_hash
+        self.basepath = basepath
+        self.fingerprints = fingerprints
+        self.minify = minify
+        self.template_urls = list(template_urls)
+        self.unfingerprinted = {fingerprinted: url for url, fingerprinted
+                                in (fingerprints or {}).items()}
+        self.previous = {}
+        self.current = {}
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                self.previous = json.load(file).get("outputs", {})
+        except (FileNotFoundError, ValueError):
+            # Missing or corrupt manifest: everything gets rebuilt
+            self.previous = {}
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w") as file:
+            json.dump({"outputs": self.current}, file, indent=1, sort_keys=True)
+
+    def page_entry(self, src_path, dest_path=None):
+        """
+        Returns the inputs of the page built from src_path. A page whose
+        source and template are unchanged references the same urls as
+        when it was built, so only the fingerprints of those are compared:
+        editing an asset doesn't rebuild the pages that don't use it.
+        """
+        previous = self.previous.get(str(dest_path)) or {}
+        return {
+            "source": str(src_path),
+            "source_hash": hash_file(src_path),
+            "template_hash": self.template_hash,
+            "basepath": self.basepath,
+            "fingerprints": self._fingerprints_of(previous.get("fingerprints") or []),
+            "minify": self.minify,
+        }
+
+    def record_references(self, dest_path, references):
+        """
+        Records the fingerprints of the urls a rebuilt page references,
+        given as found in its html (see depgraph.find_references).
+        """
+        entry = self.current.get(str(dest_path))
+        if entry is None or self.fingerprints is None:
+            return
+        # The html holds the fingerprinted urls: record the original ones
+        urls = [self.unfingerprinted.get(url, url) for url in references]
+        entry["fingerprints"] = self._fingerprints_of(urls)
+
+    def _fingerprints_of(self, urls):
+        if self.fingerprints is None:
+            return None
+        # Unfingerprinted urls are kept too: an asset added under one of
+        # them changes what the page must link to
+        urls = set(urls).union(self.template_urls)
+        return {url: self.fingerprints.get(url) for url in sorted(urls)}
+
+    def asset_entry(self, src_path, dest_path=None):
+        # Static files can be large: their size and mtime stand in for a hash
+        stat = os.stat(src_path)
+        return {
+            "source": str(src_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def is_fresh(self, dest_path, entry):
+        """
+        Records the entry for this build and tells whether the
+        existing output at dest_path can be kept as is.
+        """
+        key = str(dest_path)
+        self.current[key] = entry
+        return self.previous.get(key) == entry and os.path.exists(dest_path)
+
+    def relocate(self, old_root, new_root):
+        """Moves the outputs recorded under old_root to new_root."""
+        self.previous = _relocate_keys(self.previous, old_root, new_root)
+        self.current = _relocate_keys(self.current, old_root, new_root)
+
+    def invalidate(self, dest_path):
+        """
+        Marks an output whose build failed: it is kept on disk
+        but will be rebuilt next time.
+        """
+        self.current[str(dest_path)] = None
+
+    def stale_outputs(self):
+        """Outputs of the previous build that this build didn't produce."""
+        return sorted(set(self.previous) - set(self.current))
+
+    def remove_stale_outputs(self):
+        removed = []
+        for output in self.stale_outputs():
+            for suffix in COMPRESSED_SUFFIXES:
+                try:
+                    os.remove(output + suffix)
+                except FileNotFoundError:
+                    pass
+            try:
+                os.remove(output)
+                removed.append(output)
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+def relocate_path(path, old_root, new_root):
+    """Returns path moved from under old_root to under new_root, if it was."""
+    old_root = os.path.join(str(old_root), "")
+    if not path.startswith(old_root):
+        return path
+    return os.path.join(str(new_root), path[len(old_root):])
+
+
+def _relocate_keys(entries, old_root, new_root):
+    return {relocate_path(key, old_root, new_root): entry
+            for key, entry in entries.items()}
@@ -0,0 +1,125 @@
+import re
+
+
+# Whether this process writes minified html
+_enabled = False
+
+# Whitespace to collapse into one space: any run but a lone space
+WHITESPACE_PATTERN = re.compile(r"[ \t\r\n\f]{2,}|[\t\r\n\f]")
+
+# Elements whose whitespace is content
+VERBATIM_PATTERN = re.compile(
+    r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.DOTALL | re.IGNORECASE)
+
+# Whitespace spanning lines, i.e. indentation
+LINE_BREAK_PATTERN = re.compile(r"[ \t\r\f]*\n\s*")
+
+# The name of the tag starting at "<", or nothing for comments and doctypes
+TAG_NAME_PATTERN = re.compile(r"</?([a-zA-Z][a-zA-Z0-9-]*)")
+
+# Elements that aren't laid out inline: whitespace next to their tags
+# isn't rendered, so it can be dropped rather than collapsed
+BLOCK_ELEMENTS = {
+    "address", "article", "aside", "base", "blockquote", "body", "br",
+    "caption", "col", "colgroup", "dd", "details", "dialog", "div", "dl",
+    "dt", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2",
+    "h3", "h4", "h5", "h6", "head", "header", "hgroup", "hr", "html", "li",
+    "link", "main", "menu", "meta", "nav", "noscript", "ol", "p", "pre",
+    "script", "section", "style", "summary", "table", "tbody", "td",
+    "template", "tfoot", "th", "thead", "title", "tr", "ul",
+}
+
+# The start tags of raw html, and their quoted attributes: a value is
+# only unquoted where it ends the attribute (not before "/>")
+START_TAG_PATTERN = re.compile(r"<[a-zA-Z][^<>]*>")
+QUOTED_ATTRIBUTE_PATTERN = re.compile(
+    r"""\s([^\s"'=<>/]+)=(?:"([^"]*)"|'([^']*)')(?=[\s>])""")
+
+# Attribute values that are valid unquoted
+UNQUOTED_VALUE_PATTERN = re.compile(r"""[^\s"'=<>`]+""")
+
+
+def enable_minify():
+    """Makes the html written by this process minified."""
+    global _enabled
+    _enabled = True
+
+
+def disable_minify():
+    global _enabled
+    _enabled = False
+
+
+def minify_enabled():
+    return _enabled
+
+
+def collapse_whitespace(text):
+    """Collapses every whitespace run of a text node into a single space."""
+    return WHITESPACE_PATTERN.sub(" ", text)
+
+
+def attribute(key, value):
+    """Returns ' key=value', quoting value only when it needs it."""
+    if UNQUOTED_VALUE_PATTERN.fullmatch(value):
+        return f" {key}={value}"
+    return f' {key}="{value}"'
+
+
+def minify_template(text):
+    """
+    Minifies the static html of a template: whitespace spanning lines is
+    dropped next to the tag of a block element (indentation), and every
+    other whitespace run, such as a line break between two inline
+    elements, is collapsed into a space. Attribute values lose their
+    quotes where they don't need them, as attribute() writes them.
+    <pre>, <textarea>, <script> and <style> elements are left untouched.
+    """
+    parts = VERBATIM_PATTERN.split(text)
+    minified = []
+    # split() yields text, element, tag name, text, element, tag name, ...
+    for index in range(0, len(parts), 3):
+        html = LINE_BREAK_PATTERN.sub(_line_break, parts[index])
+        html = collapse_whitespace(html)
+        minified.append(START_TAG_PATTERN.sub(_unquote_attributes, html))
+        if index + 1 < len(parts):
+            minified.append(parts[index + 1])
+    return "".join(minified)
+
+
+def _unquote_attributes(tag):
+    return QUOTED_ATTRIBUTE_PATTERN.sub(_unquote_attribute, tag.group())
+
+
+def _unquote_attribute(match):
+    key = match.group(1)
+    value = match.group(2) if match.group(2) is not None else match.group(3)
+    # srcset is only rewritten for the basepath when quoted, and a
+    # single-quoted value may hold the double quote attribute() would use
+    if key.lower() == "srcset" or '"' in value:
+        return match.group()
+    return attribute(key, value)
+
+
+def _line_break(match):
+    # The ends of a part border the template's ends or a verbatim element
+    text = match.string
+    start, end = match.start(), match.end()
+    if start == 0 or end == len(text):
+        return ""
+    if text[start - 1] == ">" and _is_block_tag(text, text.rfind("<", 0, start)):
+        return ""
+    if text[end] == "<" and _is_block_tag(text, end):
+        return ""
+    return " "
+
+
+def _is_block_tag(text, start):
+    """Tells whether the tag at text[start] can't be laid out inline."""
+    if start < 0:
+        return False
+    name = TAG_NAME_PATTERN.match(text, start)
+    if name is None:
+        # A comment or a doctype
+        return text.startswith("<!", start)
+    return name.group(1).lower() in BLOCK_ELEMENTS
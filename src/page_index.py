@@ -0,0 +1,75 @@
+import json
+import os
+from datetime import datetime, timezone
+from manifest import relocate_path
+
+
+class PageIndex():
+    """
+    What the sitemap and the feed need to know about every page: its
+    title, summary, source and modification time, by output path.
+
+    It is persisted between builds, so pages an incremental build skips
+    keep their entry without being parsed again.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}
+        self.pages = {}
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                self.previous = json.load(file).get("pages", {})
+        except (FileNotFoundError, ValueError):
+            self.previous = {}
+        return self
+
+    def save(self):
+        with open(self.path, "w") as file:
+            json.dump({"pages": self.pages}, file, indent=1, sort_keys=True)
+
+    def record_page(self, dest_path, src_path, page):
+        """Records a rendered page from what generate_pages returned."""
+        mtime = os.stat(src_path).st_mtime
+        self.pages[os.path.abspath(dest_path)] = {
+            "title": page["title"],
+            "summary": page["summary"],
+            "source": os.path.abspath(src_path),
+            "updated": datetime.fromtimestamp(mtime, timezone.utc)
+                               .isoformat(timespec="seconds"),
+        }
+
+    def keep(self, dest_path):
+        """Carries over the entry of a page this build didn't render."""
+        key = os.path.abspath(dest_path)
+        if key in self.previous:
+            self.pages[key] = self.previous[key]
+
+    def relocate(self, old_root, new_root):
+        """Moves the pages recorded under old_root to new_root."""
+        old_root, new_root = os.path.abspath(old_root), os.path.abspath(new_root)
+        self.previous = {relocate_path(key, old_root, new_root): entry
+                         for key, entry in self.previous.items()}
+        self.pages = {relocate_path(key, old_root, new_root): entry
+                      for key, entry in self.pages.items()}
+
+    def entries(self, dest_dir):
+        """Returns the (url, entry) pairs of the pages of the site, by url."""
+        dest_dir = os.path.abspath(dest_dir)
+        entries = []
+        for path, entry in self.pages.items():
+            if path.startswith(os.path.join(dest_dir, "")):
+                entries.append((page_url(os.path.relpath(path, dest_dir)), entry))
+        return sorted(entries)
+
+
+def page_url(relative_path):
+    """
+    Returns the root-relative url a page is served at,
+    e.g. /blog/post/ for blog/post/index.html.
+    """
+    url = "/" + relative_path.replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        return url[:-len("index.html")]
+    return url
@@ -0,0 +1,136 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from copy_static import run_work_item
+from manifest import COMPRESSED_SUFFIXES
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only .gz siblings are written
+    brotli = None
+
+
+# Outputs worth compressing: text formats
+COMPRESSIBLE_EXTENSIONS = {".html", ".htm", ".css", ".js", ".mjs", ".json",
+                           ".svg", ".xml", ".txt", ".map", ".webmanifest"}
+
+# Below this size a response fits in a packet anyway
+MIN_SIZE = 256
+
+
+def encoders():
+    """Returns the (suffix, compress) pairs of the available encodings."""
+    gz_suffix, br_suffix = COMPRESSED_SUFFIXES
+    encodings = [(gz_suffix, _gzip)]
+    if brotli is not None:
+        encodings.append((br_suffix, _brotli))
+    return encodings
+
+
+def _gzip(data):
+    # mtime=0 keeps the output identical between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def is_compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def compress_file(path, encodings=None, made_from=None):
+    """
+    Writes the compressed siblings of path (path.gz, path.br) and returns
+    (siblings written, the [size, mtime_ns] of the bytes they hold).
+    Siblings are kept when made_from, as returned for them, still matches
+    the file. A sibling that wouldn't be smaller than the file is not written.
+    """
+    if encodings is None:
+        encodings = encoders()
+    stat = os.stat(path)
+    source = [stat.st_size, stat.st_mtime_ns]
+    suffixes = [suffix for suffix, _ in encodings]
+    for suffix in COMPRESSED_SUFFIXES:
+        if suffix not in suffixes or stat.st_size < MIN_SIZE:
+            # No longer written (e.g. brotli was uninstalled), or not worth it
+            _remove(path + suffix)
+    if stat.st_size < MIN_SIZE:
+        return 0, source
+    # A sibling that wasn't smaller is missing, so its file is tried again
+    if made_from == source and all(os.path.exists(path + suffix)
+                                   for suffix in suffixes):
+        return 0, source
+
+    with open(path, "rb") as file:
+        data = file.read()
+    written = 0
+    for suffix, compress in encodings:
+        sibling = path + suffix
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            _remove(sibling)
+            continue
+        # Replace rather than rewrite: the sibling may be a hard link
+        # shared with the served output
+        tmp_path = f"{sibling}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(compressed)
+        os.replace(tmp_path, sibling)
+        written += 1
+    return written, source
+
+
+def precompress_tree(dest_dir, jobs=1, record_path=None):
+    """
+    Compresses every text output of dest_dir in a pool of jobs threads, or
+    one per CPU when jobs is 1 (zlib and brotli release the GIL).
+    With a record_path, the size and mtime of every compressed output is
+    saved there, and outputs that didn't change since are skipped.
+    Returns (written, errors).
+    """
+    encodings = encoders()
+    previous = _load_record(record_path)
+    outputs = []
+    for root, _, files in os.walk(dest_dir):
+        for name in files:
+            if is_compressible(name):
+                outputs.append(os.path.join(root, name))
+
+    def compress(path):
+        key = os.path.relpath(path, dest_dir)
+        return run_work_item(path, compress_file, path, encodings, previous.get(key))
+
+    workers = jobs if jobs > 1 else os.cpu_count() or 1
+    with ThreadPoolExecutor(workers) as executor:
+        results = list(executor.map(compress, outputs))
+
+    written = sum(value[0] for _, value in results if value)
+    errors = [error for error, _ in results if error is not None]
+    if record_path is not None:
+        current = {os.path.relpath(path, dest_dir): value[1]
+                   for path, (_, value) in zip(outputs, results) if value}
+        with open(record_path, "w") as file:
+            json.dump({"files": current}, file, indent=1, sort_keys=True)
+    return written, errors
+
+
+def _load_record(record_path):
+    if record_path is None:
+        return {}
+    try:
+        with open(record_path) as file:
+            return {key: list(value)
+                    for key, value in json.load(file).get("files", {}).items()}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,193 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+# Recorder of the page or file being built by this thread, if any.
+# Instrumented code checks it so profiling costs nothing when it's off.
+_current = threading.local()
+
+
+def active_recorder():
+    return getattr(_current, "recorder", None)
+
+
+class StageRecorder():
+    """
+    Records wall and CPU time for one page (or copied file), split by stage.
+
+    Stages nest: while an inner stage runs, the outer one is paused,
+    so every stage only counts its own time. CPU time is the recording
+    thread's own, so steps running in parallel threads aren't charged
+    for each other.
+    """
+    def __init__(self, path, kind):
+        self.path = str(path)
+        self.kind = kind
+        self.stages = {}
+        self.stack = []
+
+    def start(self, name):
+        now = (time.perf_counter(), time.thread_time())
+        if self.stack:
+            self._add(self.stack[-1], now)
+        self.stack.append([name, now])
+
+    def stop(self):
+        now = (time.perf_counter(), time.thread_time())
+        self._add(self.stack.pop(), now)
+        if self.stack:
+            self.stack[-1][1] = now
+
+    def _add(self, frame, now):
+        name, (wall_start, cpu_start) = frame
+        stage = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        stage["wall"] += now[0] - wall_start
+        stage["cpu"] += now[1] - cpu_start
+        frame[1] = now
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "kind": self.kind,
+            "wall": sum(stage["wall"] for stage in self.stages.values()),
+            "cpu": sum(stage["cpu"] for stage in self.stages.values()),
+            "stages": self.stages,
+        }
+
+
+@contextmanager
+def _timed(recorder, name):
+    recorder.start(name)
+    try:
+        yield
+    finally:
+        recorder.stop()
+
+
+def stage(name):
+    """Context manager timing a stage of the current page, if profiling."""
+    recorder = active_recorder()
+    if recorder is None:
+        return nullcontext()
+    return _timed(recorder, name)
+
+
+def timed_iter(name, iterable):
+    """
+    Wraps an iterable so the time spent producing each item counts
+    towards the stage name, if profiling.
+    """
+    recorder = active_recorder()
+    if recorder is None:
+        return iterable
+    return _timed_iter(recorder, name, iterable)
+
+
+def _timed_iter(recorder, name, iterable):
+    iterator = iter(iterable)
+    while True:
+        recorder.start(name)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            recorder.stop()
+        yield item
+
+
+def timed_call(name, func):
+    """Wraps func so each call counts towards the stage name, if profiling."""
+    recorder = active_recorder()
+    if recorder is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        recorder.start(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.stop()
+    return wrapper
+
+
+def record_work_item(path, kind, func, *args, **kwargs):
+    """
+    Runs func with a fresh recorder active and returns its result
+    together with the recorded timings, as a plain dict so it can be
+    sent back from a worker process.
+    """
+    recorder = StageRecorder(path, kind)
+    _current.recorder = recorder
+    try:
+        with _timed(recorder, "other"):
+            result = func(*args, **kwargs)
+    finally:
+        _current.recorder = None
+    return result, recorder.to_dict()
+
+
+def add_stages(record, stages):
+    """
+    Adds stages timed in other threads on behalf of a work item, such as
+    the background read and write of a pipelined page, to its record.
+    """
+    for name, timings in stages.items():
+        stage = record["stages"].setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        stage["wall"] += timings["wall"]
+        stage["cpu"] += timings["cpu"]
+        record["wall"] += timings["wall"]
+        record["cpu"] += timings["cpu"]
+
+
+class BuildProfile():
+    """
+    Timings of every page and file of a build, with a summary
+    of the slowest ones and a JSON dump to compare builds.
+    """
+    def __init__(self):
+        self.records = []
+        self.started = time.perf_counter()
+        self.total_wall = None
+
+    def add(self, record):
+        self.records.append(record)
+
+    def finish(self):
+        self.total_wall = time.perf_counter() - self.started
+
+    def stage_totals(self):
+        totals = {}
+        for record in self.records:
+            for name, stage in record["stages"].items():
+                total = totals.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+                total["wall"] += stage["wall"]
+                total["cpu"] += stage["cpu"]
+        return totals
+
+    def report(self, top=10):
+        lines = ["--> Build profile"]
+        if self.total_wall is not None:
+            lines.append(f"Total wall time: {self.total_wall * 1000:.1f} ms")
+
+        lines.append("Stages (wall / cpu):")
+        totals = self.stage_totals()
+        for name, total in sorted(totals.items(), key=lambda item: -item[1]["wall"]):
+            lines.append(f"  {name:<20} {total['wall'] * 1000:10.2f} ms "
+                         f"{total['cpu'] * 1000:10.2f} ms")
+
+        lines.append(f"Slowest pages and files (top {top}):")
+        slowest = sorted(self.records, key=lambda record: -record["wall"])[:top]
+        for record in slowest:
+            lines.append(f"  {record['wall'] * 1000:10.2f} ms  {record['path']}")
+        return "\n".join(lines)
+
+    def dump_json(self, path):
+        with open(path, "w") as file:
+            json.dump({
+                "total_wall": self.total_wall,
+                "stages": self.stage_totals(),
+                "records": self.records,
+            }, file, indent=1)
@@ -0,0 +1,246 @@
+import hashlib
+import marshal
+import os
+import shutil
+from collections import OrderedDict
+from minify import minify_enabled
+
+
+# Bump whenever the html produced for a block changes,
+# so entries rendered by an older parser are never reused
+PARSER_VERSION = "2"
+
+# Bump whenever what is stored for a parsed page changes
+PAGE_FORMAT = "4"
+
+# Header of every parsed page entry: a magic string and the versions
+PAGE_MAGIC = f"SSGP{PARSER_VERSION}.{PAGE_FORMAT}\n".encode()
+
+# Caches used by this process, if any
+_active_cache = None
+_active_settings = None
+_active_page_cache = None
+_active_page_settings = None
+
+
+class RenderCache():
+    """
+    Content-addressed cache of the html rendered for markdown blocks.
+
+    Entries are keyed by the hash of the block text and the parser
+    version. The memory tier is an LRU bounded by the size of the html
+    it holds; the optional disk tier under cache_dir survives between
+    builds and is pruned by size with prune().
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, cache_dir=None,
+                 max_disk_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir = None
+        if cache_dir is not None:
+            self.cache_dir = os.path.join(cache_dir, "blocks", f"v{PARSER_VERSION}")
+
+    @staticmethod
+    def key(block):
+        digest = hashlib.sha256(block.encode())
+        if minify_enabled():
+            # Minified html is cached apart from the regular html
+            digest.update(b"\0minified")
+        return digest.hexdigest()
+
+    def get(self, block):
+        key = self.key(block)
+        html = self.entries.get(key)
+        if html is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+        html = self._read_disk(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, html)
+        return html
+
+    def put(self, block, html):
+        key = self.key(block)
+        self._remember(key, html)
+        self._write_disk(key, html)
+
+    def _remember(self, key, html):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = html
+        self.size += len(html)
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".html")
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                html = file.read()
+            # prune() evicts by mtime, so a hit marks the entry as recent
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return html
+
+    def _write_disk(self, key, html):
+        if self.cache_dir is None:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent workers never read half an entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(html)
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        """
+        Removes the entries of other parser versions and the least
+        recently used entries beyond max_disk_bytes.
+        """
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        root = os.path.dirname(self.cache_dir)
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if path != self.cache_dir and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        prune_directory(self.cache_dir, self.max_disk_bytes)
+
+
+class PageCache():
+    """
+    Disk cache of parsed pages, so templating can run without parsing.
+
+    Each markdown source maps, by the hash of its content, to its title,
+    its body html (root-relative, before the basepath is applied) and
+    its summary,
+    stored with marshal behind a version header. A template or basepath
+    change, e.g. building the preview and production variants, then only
+    re-runs the templating phase.
+    """
+    def __init__(self, cache_dir, max_disk_bytes=1024 * 1024 * 1024):
+        self.cache_dir = os.path.join(cache_dir, "pages")
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".bin")
+
+    def load(self, key):
+        """Returns (title, body_html, summary, text) for a source hash, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        if not data.startswith(PAGE_MAGIC):
+            # Written by another parser version
+            self.misses += 1
+            return None
+        try:
+            title, body, summary, text = marshal.loads(data[len(PAGE_MAGIC):])
+        except (EOFError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return title, body, summary, text
+
+    def store(self, key, title, body, summary="", text=""):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(PAGE_MAGIC)
+            file.write(marshal.dumps((title, body, summary, text)))
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        prune_directory(self.cache_dir, self.max_disk_bytes)
+
+
+def prune_directory(directory, max_bytes):
+    """Removes the least recently used files of directory beyond max_bytes."""
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+def enable_cache(max_bytes=64 * 1024 * 1024, cache_dir=None,
+                 max_disk_bytes=1024 * 1024 * 1024):
+    """Makes markdown_to_html_node use a render cache in this process."""
+    global _active_cache, _active_settings
+    _active_settings = (max_bytes, cache_dir, max_disk_bytes)
+    _active_cache = RenderCache(max_bytes, cache_dir, max_disk_bytes)
+    return _active_cache
+
+
+def disable_cache():
+    global _active_cache, _active_settings, _active_page_cache
+    global _active_page_settings
+    _active_cache = None
+    _active_settings = None
+    _active_page_cache = None
+    _active_page_settings = None
+
+
+def enable_page_cache(cache_dir, max_disk_bytes=1024 * 1024 * 1024):
+    """Makes generate_pages reuse parsed pages from cache_dir in this process."""
+    global _active_page_cache, _active_page_settings
+    _active_page_settings = (cache_dir, max_disk_bytes)
+    _active_page_cache = PageCache(cache_dir, max_disk_bytes)
+    return _active_page_cache
+
+
+def active_page_cache():
+    return _active_page_cache
+
+
+def active_cache():
+    return _active_cache
+
+
+def active_settings():
+    """
+    The arguments of enable_cache and enable_page_cache, or None:
+    worker processes are set up with them so they share the disk tiers.
+    """
+    return _active_settings, _active_page_settings
+
+
+def enable_settings(settings):
+    """Enables in this process the caches described by active_settings()."""
+    block_settings, page_settings = settings
+    if block_settings is not None:
+        enable_cache(*block_settings)
+    if page_settings is not None:
+        enable_page_cache(*page_settings)
@@ -0,0 +1,290 @@
+import hashlib
+import heapq
+import json
+import marshal
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+
+
+# Words as the browser splits the query: runs of letters, digits and _
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+MAX_TOKEN_LENGTH = 40
+
+# Shards hold the terms sharing their first PREFIX_LENGTH characters
+PREFIX_LENGTH = 2
+
+# Postings held in memory before they are spilled to a sorted run on disk
+MAX_POSTINGS = 500_000
+
+# Where the index is written, under the root of the site
+SEARCH_DIR = "search"
+
+# Bump whenever the layout of the files under search/ changes
+INDEX_VERSION = 1
+
+# Where the pages rendered by this process record their terms, if anywhere
+_terms_dir = None
+
+
+def enable_search_index(terms_dir):
+    """Makes the pages rendered by this process record their terms in terms_dir."""
+    global _terms_dir
+    _terms_dir = str(terms_dir)
+    os.makedirs(_terms_dir, exist_ok=True)
+
+
+def disable_search_index():
+    global _terms_dir
+    _terms_dir = None
+
+
+def search_index_enabled():
+    return _terms_dir is not None
+
+
+def search_terms_dir():
+    return _terms_dir
+
+
+def tokenize(text):
+    """Returns the casefolded words of text worth indexing."""
+    return [token for token in TOKEN_PATTERN.findall(text.casefold())
+            if len(token) <= MAX_TOKEN_LENGTH]
+
+
+def count_terms(plain_text):
+    """Returns {term: occurrences} for the strings of plain_text."""
+    # One scan of the whole text: the regex and Counter loops run in C
+    return Counter(tokenize("\n".join(plain_text)))
+
+
+def terms_path(terms_dir, src_path):
+    digest = hashlib.sha256(os.path.abspath(src_path).encode()).hexdigest()
+    return os.path.join(terms_dir, f"{digest[:32]}.terms")
+
+
+def record_page_terms(src_path, plain_text, terms_dir=None):
+    """
+    Saves the term counts of a page, with the size and mtime of its
+    source, so a later build can index the page without parsing it.
+    Returns the counts.
+    """
+    terms = count_terms(plain_text)
+    path = terms_path(terms_dir or _terms_dir, src_path)
+    stat = os.stat(src_path)
+    # Written by worker processes: replace rather than rewrite in place
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        marshal.dump((stat.st_size, stat.st_mtime_ns, dict(terms)), file)
+    os.replace(tmp_path, path)
+    return terms
+
+
+def load_page_terms(terms_dir, src_path):
+    """Returns the recorded term counts of a page, or None if its source changed."""
+    try:
+        with open(terms_path(terms_dir, src_path), "rb") as file:
+            size, mtime_ns, terms = marshal.load(file)
+        stat = os.stat(src_path)
+    except (FileNotFoundError, EOFError, ValueError, TypeError):
+        return None
+    if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    return terms
+
+
+def delta_encode(postings):
+    """
+    Turns flat (doc id, count) pairs in ascending doc id order,
+    [3, 1, 7, 2], into (gap, count) pairs: [3, 1, 4, 2].
+    """
+    encoded = postings[:]
+    doc_ids = postings[0::2]
+    encoded[2::2] = [doc_id - previous
+                     for previous, doc_id in zip(doc_ids, doc_ids[1:])]
+    return encoded
+
+
+def decode_postings(encoded):
+    """Returns the (doc id, count) pairs of delta-encoded postings."""
+    pairs = []
+    doc_id = 0
+    for index in range(0, len(encoded), 2):
+        doc_id += encoded[index]
+        pairs.append((doc_id, encoded[index + 1]))
+    return pairs
+
+
+def shard_name(prefix):
+    """Returns the file-safe name of the shard of a term prefix."""
+    if prefix.isascii() and prefix.isalnum():
+        return prefix
+    # Hex names are longer than any ascii prefix, so they never collide
+    return "x" + prefix.encode().hex()
+
+
+class InvertedIndexWriter():
+    """
+    Builds an inverted index one document at a time within a bounded
+    amount of memory: once MAX_POSTINGS postings are held, they are
+    written out as a run sorted by term, and finish() merges the runs
+    into JSON shards, one per term prefix, as it reads them.
+
+    Documents must be added in ascending doc id order.
+    """
+    def __init__(self, out_dir, max_postings=MAX_POSTINGS):
+        self.out_dir = out_dir
+        self.max_postings = max_postings
+        self.postings = {}
+        self.held = 0
+        self.runs_dir = tempfile.mkdtemp(prefix="search-runs-")
+        self.runs = []
+
+    def add(self, doc_id, terms):
+        for term, count in terms.items():
+            self.postings.setdefault(term, []).extend((doc_id, count))
+        self.held += len(terms)
+        if self.held >= self.max_postings:
+            self._spill()
+
+    def _spill(self):
+        path = os.path.join(self.runs_dir, f"{len(self.runs)}.jsonl")
+        with open(path, "w") as file:
+            for term in sorted(self.postings):
+                file.write(json.dumps([term, self.postings[term]],
+                                      separators=(",", ":")))
+                file.write("\n")
+        self.runs.append(path)
+        self.postings = {}
+        self.held = 0
+
+    def finish(self):
+        """Writes the shards and returns ({prefix: shard file}, number of terms)."""
+        if self.postings or not self.runs:
+            self._spill()
+        shards = {}
+        terms = 0
+        shard = None
+        files = [open(path) for path in self.runs]
+        try:
+            # Runs hold increasing doc ids, and merge() keeps their order
+            # for equal terms, so a term's postings come out sorted
+            merged = heapq.merge(*[map(json.loads, file) for file in files],
+                                 key=lambda item: item[0])
+            term, postings = None, []
+            for next_term, next_postings in merged:
+                if next_term != term:
+                    if term is not None:
+                        shard = self._write_term(shards, shard, term, postings)
+                        terms += 1
+                    term, postings = next_term, []
+                postings.extend(next_postings)
+            if term is not None:
+                shard = self._write_term(shards, shard, term, postings)
+                terms += 1
+        finally:
+            for file in files:
+                file.close()
+            if shard is not None:
+                shard.close()
+            shutil.rmtree(self.runs_dir, ignore_errors=True)
+        return shards, terms
+
+    def _write_term(self, shards, shard, term, postings):
+        prefix = term[:PREFIX_LENGTH]
+        if prefix not in shards:
+            if shard is not None:
+                shard.close()
+            shards[prefix] = f"terms-{shard_name(prefix)}.json"
+            shard = ShardWriter(os.path.join(self.out_dir, shards[prefix]))
+        shard.write(term, delta_encode(postings))
+        return shard
+
+
+class ShardWriter():
+    """Streams the {term: postings} object of a shard to its file."""
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+        self.separator = "{"
+
+    def write(self, term, postings):
+        self.file.write(self.separator)
+        self.file.write(json.dumps(term, ensure_ascii=False))
+        self.file.write(":")
+        self.file.write(json.dumps(postings, separators=(",", ":")))
+        self.separator = ","
+
+    def close(self):
+        self.file.write("}" if self.separator == "," else "{}")
+        self.file.close()
+
+
+def write_search_index(dest_dir, entries, terms_dir, basepath="/",
+                       max_postings=MAX_POSTINGS):
+    """
+    Writes the search index of the (url, entry) pairs of a PageIndex
+    under dest_dir/search: index.json, docs.json (the url and title of
+    every doc id) and the terms-*.json shards of delta-encoded postings.
+
+    The terms recorded when the pages were rendered are used; a page
+    without them (rendered before the index was enabled) is parsed.
+    Returns (documents, terms, pages parsed).
+    """
+    out_dir = os.path.join(dest_dir, SEARCH_DIR)
+    # Shards are all rewritten: start from an empty directory
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    writer = InvertedIndexWriter(out_dir, max_postings)
+    recorded = set()
+    documents = parsed = 0
+    with open(os.path.join(out_dir, "docs.json"), "w", encoding="utf-8") as docs:
+        docs.write("[")
+        for doc_id, (url, entry) in enumerate(entries):
+            source = entry["source"]
+            terms = load_page_terms(terms_dir, source)
+            if terms is None:
+                terms = _parse_page_terms(source, terms_dir)
+                parsed += 1
+            recorded.add(terms_path(terms_dir, source))
+            writer.add(doc_id, terms)
+            documents += 1
+            if doc_id:
+                docs.write(",")
+            docs.write(json.dumps([basepath + url.lstrip("/"), entry["title"]],
+                                  ensure_ascii=False))
+        docs.write("]")
+    shards, terms = writer.finish()
+
+    with open(os.path.join(out_dir, "index.json"), "w") as file:
+        json.dump({
+            "version": INDEX_VERSION,
+            "documents": documents,
+            "prefix_length": PREFIX_LENGTH,
+            "docs": "docs.json",
+            "shards": shards,
+        }, file, indent=1, sort_keys=True)
+
+    _prune_terms(terms_dir, recorded)
+    return documents, terms, parsed
+
+
+def _parse_page_terms(src_path, terms_dir):
+    # Only loaded for pages rendered without the index: the parser
+    # imports this module
+    from generate_content import parse_page
+
+    plain_text = []
+    parse_page(src_path, plain_text=plain_text)
+    return record_page_terms(src_path, plain_text, terms_dir)
+
+
+def _prune_terms(terms_dir, recorded):
+    """Removes the terms of pages that are no longer part of the site."""
+    for name in os.listdir(terms_dir):
+        path = os.path.join(terms_dir, name)
+        if path not in recorded:
+            os.remove(path)
@@ -0,0 +1,249 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from config import add_config_arguments, config_from_args
+from copy_static import copy_asset, copy_static_content, render_page
+
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = (
+    "<script>new EventSource(\"" + RELOAD_PATH + "\")"
+    ".onmessage = () => location.reload();</script>"
+)
+
+
+class Watcher():
+    """
+    Polls the sources of the site and reports which files were
+    changed, added or removed since the previous poll.
+    """
+    def __init__(self, paths):
+        self.paths = [Path(path) for path in paths]
+        self.snapshot = self.scan()
+
+    def scan(self):
+        mtimes = {}
+        for path in self.paths:
+            if path.is_file():
+                mtimes[path] = path.stat().st_mtime_ns
+                continue
+            for root, _, files in os.walk(path):
+                for name in files:
+                    file_path = Path(root) / name
+                    try:
+                        mtimes[file_path] = file_path.stat().st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+        return mtimes
+
+    def poll(self):
+        """Returns (changed, removed): the paths to rebuild and to delete."""
+        current = self.scan()
+        changed = [path for path, mtime in current.items()
+                   if self.snapshot.get(path) != mtime]
+        removed = [path for path in self.snapshot if path not in current]
+        self.snapshot = current
+        return changed, removed
+
+
+class LiveReload():
+    """Tells every connected browser to reload the page."""
+    def __init__(self):
+        self.clients = []
+        self.lock = threading.Lock()
+
+    def connect(self):
+        client = queue.Queue()
+        with self.lock:
+            self.clients.append(client)
+        return client
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.remove(client)
+
+    def notify(self):
+        with self.lock:
+            for client in self.clients:
+                client.put("reload")
+
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the built site, injecting the live reload script into
+    html pages, and streams reload events to browsers over SSE.
+    """
+    def __init__(self, *args, live_reload=None, **kwargs):
+        self.live_reload = live_reload
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path == RELOAD_PATH:
+            return self.stream_reload_events()
+
+        path = Path(self.translate_path(self.path))
+        if path.is_dir():
+            if not self.path.split("?")[0].endswith("/"):
+                # Let the base class redirect to the trailing slash
+                return super().do_GET()
+            path = path / "index.html"
+        if path.suffix == ".html" and path.is_file():
+            return self.send_html(path)
+        return super().do_GET()
+
+    def send_html(self, path):
+        body = inject_reload_script(path.read_text()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reload_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        client = self.live_reload.connect()
+        try:
+            while True:
+                try:
+                    message = client.get(timeout=15)
+                    self.wfile.write(f"data: {message}\n\n".encode())
+                except queue.Empty:
+                    # Keep the connection alive
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.live_reload.disconnect(client)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def inject_reload_script(html):
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+def output_path(src_item, src_dir, dest_dir):
+    """Returns where the build writes src_item."""
+    dest_item = dest_dir / src_item.relative_to(src_dir)
+    if dest_item.suffix.lower() == ".md":
+        return dest_item.with_suffix(".html")
+    return dest_item
+
+
+def source_dir(src_item, src_dirs):
+    """Returns the directory of src_dirs holding src_item, or None."""
+    for src_dir in src_dirs:
+        if src_item.is_relative_to(src_dir):
+            return src_dir
+    return None
+
+
+def rebuild(changed, removed, src_dirs, dest_dir, path_template, basepath):
+    """
+    Re-renders or re-copies only the changed sources, in this process,
+    and deletes the outputs of removed sources.
+    Returns the number of outputs touched.
+    """
+    template = Path(path_template).resolve()
+    if any(path.resolve() == template for path in changed):
+        # Every page depends on the template; assets changed alongside
+        # it must still be copied
+        pages = [path for src_dir in src_dirs for path in src_dir.rglob("*.md")]
+        changed = list(dict.fromkeys(changed + pages))
+
+    touched = 0
+    for src_item in changed:
+        src_dir = source_dir(src_item, src_dirs)
+        if src_item.resolve() == template or src_dir is None:
+            continue
+        dest_item = output_path(src_item, src_dir, dest_dir)
+        dest_item.parent.mkdir(parents=True, exist_ok=True)
+        if src_item.suffix.lower() == ".md":
+            error, _ = render_page(src_item, dest_item, path_template, basepath)
+        else:
+            error, _ = copy_asset(src_item, dest_item)
+        if error is not None:
+            print(error)
+        touched += 1
+
+    for src_item in removed:
+        src_dir = source_dir(src_item, src_dirs)
+        if src_dir is None:
+            continue
+        output_path(src_item, src_dir, dest_dir).unlink(missing_ok=True)
+        touched += 1
+    return touched
+
+
+def serve(src_dirs, dest_dir, path_template, basepath, port=8888, watch=True,
+          interval=0.2):
+    """
+    Builds the site once, serves dest_dir on localhost and, with watch,
+    rebuilds whatever changes in src_dirs or the template and tells the
+    connected browsers to reload.
+    """
+    src_dirs = [Path(src_dir) for src_dir in src_dirs]
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    for src_dir in src_dirs:
+        copy_static_content(src_dir, dest_dir, path_template, basepath)
+
+    live_reload = LiveReload()
+    handler = partial(DevRequestHandler, directory=str(dest_dir),
+                      live_reload=live_reload)
+    server = ThreadingHTTPServer(("localhost", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"--> Serving {dest_dir} at http://localhost:{port}/")
+
+    if not watch:
+        threading.Event().wait()
+        return
+
+    watcher = Watcher(src_dirs + [path_template])
+    watched = ", ".join(str(path) for path in src_dirs)
+    print(f"--> Watching {watched} and {path_template} for changes...")
+    try:
+        while True:
+            time.sleep(interval)
+            changed, removed = watcher.poll()
+            if changed or removed:
+                if rebuild(changed, removed, src_dirs, dest_dir, path_template,
+                           basepath):
+                    live_reload.notify()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def serve_command(argv):
+    """Parses the arguments of `main.py serve` and starts the server."""
+    parser = argparse.ArgumentParser(prog="main.py serve",
+                                     description="Serve the site while editing.")
+    parser.add_argument("basepath", nargs="?", default=None,
+                        help="url prefix of the site (default: /)")
+    add_config_arguments(parser)
+    parser.add_argument("--watch", action="store_true",
+                        help="rebuild changed files and reload the browser")
+    parser.add_argument("--port", type=int, default=8888)
+    args = parser.parse_args(argv)
+    try:
+        config = config_from_args(args)
+    except (OSError, ValueError) as e:
+        parser.exit(2, f"Invalid configuration: {e}\n")
+    serve(config.source_dirs(), config.output, config.template, config.basepath,
+          args.port, args.watch)
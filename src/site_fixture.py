@@ -0,0 +1,52 @@
+import io
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from copy_static import copy_static_content
+
+
+# The template and the pages of the sites the build tests use
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+PAGES = {
+    "index.md": "# Home\n\nHello",
+    "blog/post.md": "# Post\n\nA post",
+}
+
+
+def make_site(test, files=None):
+    """
+    Creates the site of a test in a temporary directory, removed once the
+    test is over. test.root holds template.html (test.template), static/
+    (test.src) with files, {path: text or bytes} defaulting to PAGES,
+    and an empty docs/ (test.dest).
+    """
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    test.root = Path(tmp.name)
+    test.src = test.root / "static"
+    test.dest = test.root / "docs"
+    test.template = test.root / "template.html"
+    test.src.mkdir()
+    test.dest.mkdir()
+    test.template.write_text(TEMPLATE)
+    for name, content in (PAGES if files is None else files).items():
+        write_file(test.src / name, content)
+
+
+def write_file(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(content, bytes):
+        path.write_bytes(content)
+    else:
+        path.write_text(content)
+
+
+def build_quietly(*args, **kwargs):
+    """
+    Runs copy_static_content(*args, **kwargs) without its "Generating
+    page..." lines in the test output, and returns what it printed.
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        copy_static_content(*args, **kwargs)
+    return output.getvalue()
@@ -0,0 +1,112 @@
+from xml.sax.saxutils import escape, quoteattr
+from staging import detach_output
+
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+
+# Most recent pages listed in the feed
+FEED_ENTRIES = 20
+
+
+class XMLWriter():
+    """
+    Writes an XML document element by element, escaping as it goes,
+    so the document is never held in memory as a whole.
+    """
+    def __init__(self, write):
+        self.write = write
+        self.open_tags = []
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+
+    def start(self, tag, attributes=None):
+        self.write(f"{self._indent()}<{tag}{self._attributes(attributes)}>\n")
+        self.open_tags.append(tag)
+
+    def end(self):
+        tag = self.open_tags.pop()
+        self.write(f"{self._indent()}</{tag}>\n")
+
+    def element(self, tag, text=None, attributes=None):
+        attributes = self._attributes(attributes)
+        if text is None:
+            self.write(f"{self._indent()}<{tag}{attributes}/>\n")
+        else:
+            self.write(f"{self._indent()}<{tag}{attributes}>{escape(text)}</{tag}>\n")
+
+    def close(self):
+        while self.open_tags:
+            self.end()
+
+    def _indent(self):
+        return " " * len(self.open_tags)
+
+    def _attributes(self, attributes):
+        if not attributes:
+            return ""
+        return "".join(f" {key}={quoteattr(value)}"
+                       for key, value in attributes.items())
+
+
+def absolute_url(site_url, basepath, url):
+    """Returns the full url of a root-relative url of the site."""
+    return site_url.rstrip("/") + basepath + url.lstrip("/")
+
+
+def write_sitemap(path, entries, site_url, basepath="/"):
+    """Writes the sitemap.xml listing every (url, entry) of a PageIndex."""
+    detach_output(path)
+    with open(path, "w", encoding="utf-8") as file:
+        xml = XMLWriter(file.write)
+        xml.start("urlset", {"xmlns": SITEMAP_NAMESPACE})
+        for url, entry in entries:
+            xml.start("url")
+            xml.element("loc", absolute_url(site_url, basepath, url))
+            xml.element("lastmod", entry["updated"])
+            xml.end()
+        xml.close()
+
+
+def write_feed(path, entries, site_url, basepath="/", section="blog",
+               title=None, author=None):
+    """
+    Writes an Atom feed of the most recently updated pages under
+    /section/, from the (url, entry) pairs of a PageIndex.
+    """
+    prefix = f"/{section.strip('/')}/"
+    posts = [(url, entry) for url, entry in entries
+             if url.startswith(prefix) and url != prefix]
+    posts.sort(key=lambda post: post[1]["updated"], reverse=True)
+    posts = posts[:FEED_ENTRIES]
+
+    home = dict(entries).get("/")
+    if title is None:
+        title = home["title"] if home else site_url
+    section_url = absolute_url(site_url, basepath, prefix)
+    updated = posts[0][1]["updated"] if posts else "1970-01-01T00:00:00+00:00"
+
+    detach_output(path)
+    with open(path, "w", encoding="utf-8") as file:
+        xml = XMLWriter(file.write)
+        xml.start("feed", {"xmlns": ATOM_NAMESPACE})
+        xml.element("title", title)
+        xml.element("id", section_url)
+        xml.element("link", attributes={"href": section_url})
+        xml.element("link", attributes={
+            "href": absolute_url(site_url, basepath, prefix + "feed.xml"),
+            "rel": "self"})
+        xml.element("updated", updated)
+        xml.start("author")
+        xml.element("name", author or title)
+        xml.end()
+        for url, entry in posts:
+            link = absolute_url(site_url, basepath, url)
+            xml.start("entry")
+            xml.element("title", entry["title"])
+            xml.element("link", attributes={"href": link})
+            xml.element("id", link)
+            xml.element("updated", entry["updated"])
+            if entry["summary"]:
+                xml.element("summary", entry["summary"])
+            xml.end()
+        xml.close()
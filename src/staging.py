@@ -0,0 +1,227 @@
+import ctypes
+import errno
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from shutil import copy2, rmtree
+from manifest import COMPRESSED_SUFFIXES
+
+
+SWAP_MODES = ["rename", "symlink"]
+
+# renameat2() arguments, see rename(2)
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+class StagedOutput():
+    """
+    Builds the site next to the served output directory, then swaps it in.
+
+    The build writes into a staging directory, optionally seeded with hard
+    links to the previous output so unchanged files are reused instead of
+    rebuilt. commit() then replaces the output directory, so the served
+    tree is never half-built, and removes the previous tree in a detached
+    process the build doesn't wait for. Whatever an interrupted build or
+    removal leaves behind is removed by the next prepare().
+
+    With swap "rename" the staging directory and the output directory are
+    exchanged in one renameat2(RENAME_EXCHANGE) call, so the output is
+    never missing either. Where that call isn't available (outside Linux,
+    or on some filesystems) the output is moved aside and the staging
+    directory renamed in its place, leaving it missing in between.
+    With "symlink" the output directory is a symlink to the current build
+    under .<name>.builds/ and is flipped atomically on any platform.
+    """
+    def __init__(self, dest_dir, swap="rename"):
+        self.dest_dir = Path(dest_dir)
+        self.swap = swap
+        name = self.dest_dir.name
+        self.root = self.dest_dir.parent
+        if swap == "symlink":
+            self.staging_dir = self._builds_dir() / str(time.time_ns())
+        else:
+            self.staging_dir = self.root / f".{name}.staging"
+        self.cleanup = None
+
+    def prepare(self, reuse=False):
+        """
+        Creates an empty staging directory, or with reuse a copy of the
+        current output made of hard links. Returns the staging directory.
+        """
+        current = self.dest_dir.resolve()
+        for leftover in self._leftovers():
+            # Left behind by an interrupted build or removal
+            if leftover != current:
+                rmtree(leftover, ignore_errors=True)
+        builds = self._builds_dir()
+        if self.swap != "symlink" and builds.is_dir() and not any(builds.iterdir()):
+            # Switched back from symlink swaps
+            builds.rmdir()
+        if reuse and self.dest_dir.exists():
+            link_tree(self.dest_dir.resolve(), self.staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        return self.staging_dir
+
+    def _builds_dir(self):
+        return self.root / f".{self.dest_dir.name}.builds"
+
+    def _leftovers(self):
+        # Whichever swap left them
+        name = self.dest_dir.name
+        leftovers = list(self.root.glob(f".{name}.old-*"))
+        if (self.root / f".{name}.staging").exists():
+            leftovers.append(self.root / f".{name}.staging")
+        builds = self._builds_dir()
+        if builds.is_dir():
+            leftovers += builds.iterdir()
+        return leftovers
+
+    def commit(self):
+        """
+        Swaps the staging directory in as the output directory and starts
+        removing the previous output. Returns the removal process, or None.
+        """
+        if self.swap == "symlink":
+            previous = self._flip_symlink()
+        else:
+            previous = self._rename()
+        if previous is None:
+            return None
+        self.cleanup = remove_detached(previous)
+        return self.cleanup
+
+    def _rename(self):
+        previous = None
+        if not os.path.lexists(self.dest_dir):
+            os.rename(self.staging_dir, self.dest_dir)
+        else:
+            previous = self.root / f".{self.dest_dir.name}.old-{time.time_ns()}"
+            if exchange_paths(self.staging_dir, self.dest_dir):
+                # The staging directory now holds the previous output
+                os.rename(self.staging_dir, previous)
+            else:
+                os.rename(self.dest_dir, previous)
+                os.rename(self.staging_dir, self.dest_dir)
+        if previous is not None and previous.is_symlink():
+            # Coming from a symlink swap: drop the link and the build it pointed to
+            target = previous.resolve()
+            previous.unlink()
+            # Out of .<name>.builds/, so that can go now
+            os.rename(target, previous)
+            builds = self._builds_dir()
+            if builds.is_dir() and not any(builds.iterdir()):
+                builds.rmdir()
+        return previous
+
+    def _flip_symlink(self):
+        previous = None
+        if self.dest_dir.is_symlink():
+            previous = self.dest_dir.resolve()
+        elif self.dest_dir.exists():
+            # First symlink build: move the real directory out of the way
+            previous = self.root / f".{self.dest_dir.name}.old-{time.time_ns()}"
+            os.rename(self.dest_dir, previous)
+
+        link = self.root / f".{self.dest_dir.name}.link"
+        if os.path.lexists(link):
+            link.unlink()
+        os.symlink(os.path.relpath(self.staging_dir, self.root), link)
+        os.replace(link, self.dest_dir)
+        return previous
+
+
+def remove_detached(path):
+    """
+    Removes the tree at path in a process of its own, which outlives this
+    one: exiting doesn't wait for a large tree to be deleted.
+    """
+    return subprocess.Popen(
+        [sys.executable, "-c", "import shutil, sys; shutil.rmtree(sys.argv[1], True)",
+         str(path)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def exchange_paths(first, second):
+    """
+    Atomically swaps the files or directories at two paths of the same
+    filesystem. Returns False, having changed nothing, where the system
+    or the filesystem can't do it.
+    """
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError, TypeError):
+        return False
+    result = renameat2(AT_FDCWD, os.fsencode(first), AT_FDCWD,
+                       os.fsencode(second), RENAME_EXCHANGE)
+    if result == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error, os.strerror(error), str(first))
+
+
+def link_tree(src_dir, dest_dir):
+    """
+    Recreates the directories of src_dir under dest_dir and hard links
+    every file into them, copying when the filesystem refuses links.
+    """
+    for root, _, files in os.walk(src_dir):
+        target = os.path.join(dest_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            src_path = os.path.join(root, name)
+            dest_path = os.path.join(target, name)
+            try:
+                os.link(src_path, dest_path)
+            except OSError:
+                copy2(src_path, dest_path)
+
+
+def prune_outputs(build_dir, outputs, keep_suffixes=()):
+    """
+    Removes the files of build_dir that aren't in outputs (paths as
+    strings), nor a sibling of one ending in keep_suffixes, then the
+    directories left empty: a staging directory seeded from the previous
+    output holds the outputs of deleted sources too. Returns the removed files.
+    """
+    removed = []
+    for root, dirs, files in os.walk(build_dir, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            if path in outputs or any(path.endswith(suffix)
+                                      and path[:-len(suffix)] in outputs
+                                      for suffix in keep_suffixes):
+                continue
+            os.remove(path)
+            removed.append(path)
+        if root != str(build_dir) and not os.listdir(root):
+            os.rmdir(root)
+    return removed
+
+
+def detach_output(path):
+    """
+    Unlinks path when it is a hard link shared with another file, e.g.
+    staged from the previous build, so rewriting it can't change the other.
+    Its precompressed siblings are removed too: they would hold the old bytes.
+    """
+    remove_compressed_siblings(path)
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_compressed_siblings(path):
+    """Removes path.gz and path.br, written by precompress for its old bytes."""
+    for suffix in COMPRESSED_SUFFIXES:
+        try:
+            os.remove(f"{path}{suffix}")
+        except FileNotFoundError:
+            pass
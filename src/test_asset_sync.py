@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from asset_sync import SYNC_MODES, files_identical, sync_asset
+
+
+class TestAssetSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.src = root / "image.png"
+        self.src.write_bytes(b"\x89PNG" + bytes(range(256)) * 40)
+        self.dest = root / "docs" / "image.png"
+        self.dest.parent.mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_every_mode_copies_then_skips(self):
+        for mode in SYNC_MODES:
+            self.dest.unlink(missing_ok=True)
+            self.assertTrue(sync_asset(self.src, self.dest, mode))
+            self.assertEqual(self.dest.read_bytes(), self.src.read_bytes())
+            self.assertFalse(sync_asset(self.src, self.dest, mode))
+
+    def test_changed_source_is_copied_again(self):
+        sync_asset(self.src, self.dest)
+        self.src.write_bytes(b"new content")
+        self.assertTrue(sync_asset(self.src, self.dest))
+        self.assertEqual(self.dest.read_bytes(), b"new content")
+
+    def test_same_content_with_other_mtime_is_hashed(self):
+        sync_asset(self.src, self.dest)
+        os.utime(self.dest, (0, 0))
+        self.assertTrue(files_identical(self.src, self.dest))
+        self.dest.write_bytes(b"x" * self.src.stat().st_size)
+        os.utime(self.dest, (0, 0))
+        self.assertFalse(files_identical(self.src, self.dest))
+
+    def test_hardlink_shares_the_inode(self):
+        sync_asset(self.src, self.dest, "hardlink")
+        self.assertTrue(os.path.samefile(self.src, self.dest))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import tempfile
+import unittest
+from pathlib import Path
+from benchmark import SHAPES, generate_corpus, measure_memory, run_benchmarks
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_reproducible(self):
+        with tempfile.TemporaryDirectory() as first, \
+             tempfile.TemporaryDirectory() as second:
+            for shape in SHAPES:
+                files1 = generate_corpus(Path(first) / shape, 3, shape, seed=7)
+                files2 = generate_corpus(Path(second) / shape, 3, shape, seed=7)
+                self.assertEqual([path.read_text() for path in files1],
+                                 [path.read_text() for path in files2])
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(pages=2, shape="small", repeat=1)
+        names = [name for name, _, _, _ in results]
+        self.assertIn("markdown_to_html_node", names)
+        self.assertIn("copy_static_content (jobs=1)", names)
+        for _, seconds, megabytes, _ in results:
+            self.assertGreater(seconds, 0)
+            self.assertGreater(megabytes, 0)
+
+    def test_measure_memory_compares_layouts(self):
+        nodes, per_node, layouts = measure_memory(pages=2, shape="small")
+        self.assertGreater(nodes, 0)
+        self.assertGreater(per_node, 0)
+        for slotted, unslotted in zip(layouts["__slots__"], layouts["__dict__"]):
+            self.assertLess(slotted, unslotted)
+
+
+if __name__ == "__main__":
+    unittest.main()
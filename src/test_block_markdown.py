@@ -1,7 +1,9 @@
 import unittest
 from inline_markdown import (BlockType,
                              markdown_to_blocks,
+                             iter_blocks,
                              block_to_block_type,
+                             classify_block,
                              markdown_to_html_node)
 
 
@@ -30,6 +32,12 @@ This is the same paragraph on a new line
         )
 
 
+    def test_iter_blocks_matches_markdown_to_blocks(self):
+        md = "\n# Title\n\n\n\nSome text\non two lines\n\n- a list\n- b\n\n  \n"
+        self.assertEqual(list(iter_blocks(md.splitlines(keepends=True))),
+                         [block for block in markdown_to_blocks(md) if block])
+
+
     def test_block_to_block_type_Paragraph(self):
         block = "This is **bolded** paragraph."
         block_type = block_to_block_type(block)
@@ -60,6 +68,24 @@ This is the same paragraph on a new line
         self.assertEqual(block_type, BlockType.ORDERED_LIST)
 
 
+    def test_classify_block_returns_content(self):
+        self.assertEqual(classify_block("- one\n- two"),
+                         (BlockType.UNORDERED_LIST, ["one", "two"]))
+        self.assertEqual(classify_block("## Title"),
+                         (BlockType.HEADING, ["Title"]))
+        self.assertEqual(classify_block("```\ncode\n```"),
+                         (BlockType.CODE, "code\n"))
+        self.assertEqual(classify_block("some\ntext"),
+                         (BlockType.PARAGRAPH, "some text"))
+
+
+    def test_classify_block_checks_every_line(self):
+        self.assertEqual(classify_block("intro\n- item")[0],
+                         BlockType.UNORDERED_LIST)
+        self.assertEqual(classify_block("- \n1. item")[0],
+                         BlockType.ORDERED_LIST)
+
+
     def test_markdown_to_html_node_paragraphs(self):
         md = """
 This is **bolded** paragraph
@@ -0,0 +1,81 @@
+import argparse
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from config import SiteConfig, add_config_arguments, config_from_args, read_config_file
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("basepath", nargs="?")
+    parser.add_argument("--jobs", type=int)
+    add_config_arguments(parser)
+    return parser.parse_args(argv)
+
+
+class TestConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.config = self.root / "site" / "site.toml"
+        self.config.parent.mkdir()
+        self.config.write_text(
+            '[paths]\noutput = "public"\ntemplate = "layout/page.html"\n\n'
+            '[build]\nbasepath = "/blog/"\njobs = 4\nmode = "incremental"\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_defaults(self):
+        config = SiteConfig()
+        self.assertEqual(config.output, Path("docs").absolute())
+        self.assertEqual(config.basepath, "/")
+        self.assertFalse(config.incremental)
+        self.assertEqual(config.manifest_path, Path(".build-manifest.json").absolute())
+
+    def test_config_file_paths_are_relative_to_it(self):
+        config = config_from_args(parse(["--config", str(self.config)]))
+        self.assertEqual(config.output, self.config.parent / "public")
+        self.assertEqual(config.template, self.config.parent / "layout" / "page.html")
+        self.assertEqual(config.static, Path("static").absolute())
+        self.assertEqual((config.basepath, config.jobs), ("/blog/", 4))
+        self.assertTrue(config.incremental)
+
+    def test_command_line_overrides_config_file(self):
+        config = config_from_args(parse(["/other/", "--jobs", "2", "--output", "out",
+                                         "--config", str(self.config)]))
+        self.assertEqual((config.basepath, config.jobs), ("/other/", 2))
+        self.assertEqual(config.output, Path("out").absolute())
+
+    def test_default_config_file(self):
+        cwd = os.getcwd()
+        os.chdir(self.config.parent)
+        try:
+            config = config_from_args(parse([]))
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(config.basepath, "/blog/")
+
+    def test_invalid_settings(self):
+        for text in ['[build]\njobs = "4"\n', '[build]\ntheme = "dark"\n',
+                     '[server]\nport = 1\n', '[build]\nmode = "fast"\n',
+                     '[build]\nsync_assets = "rsync"\n']:
+            self.config.write_text(text)
+            with self.assertRaises(ValueError):
+                config_from_args(parse(["--config", str(self.config)]))
+
+    def test_search_index_cannot_overwrite_sources(self):
+        content = self.root / "content"
+        (content / "search").mkdir(parents=True)
+        (content / "search" / "index.md").write_text("# Search")
+        SiteConfig().update({"content": content})
+        with self.assertRaises(ValueError):
+            SiteConfig().update({"content": content, "search": True})
+
+    def test_read_config_file(self):
+        self.assertEqual(read_config_file(self.config)["jobs"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
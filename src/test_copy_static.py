@@ -0,0 +1,54 @@
+import unittest
+from pathlib import Path
+from copy_static import collect_work_items
+from site_fixture import PAGES, build_quietly, make_site
+
+
+class TestCopyStatic(unittest.TestCase):
+    def setUp(self):
+        make_site(self, {**PAGES, "blog/post.md": "# Post\n\nA [post](/blog)",
+                         "blog/broken.md": "No title here", "style.css": "body {}"})
+
+    def build(self, name, jobs, async_io=False):
+        dest = self.root / name
+        dest.mkdir()
+        output = build_quietly(self.src, dest, str(self.template), "/base/",
+                               jobs=jobs, async_io=async_io)
+        return dest, output
+
+    def test_collect_work_items(self):
+        dest = self.dest
+        pages, assets = collect_work_items(self.src, dest)
+        self.assertEqual(
+            sorted(dest_item.relative_to(dest) for _, dest_item in pages),
+            [Path("blog/broken.html"), Path("blog/post.html"), Path("index.html")],
+        )
+        self.assertEqual(assets, [(self.src / "style.css", dest / "style.css")])
+        self.assertTrue((dest / "blog").is_dir())
+
+    def test_parallel_build_matches_sequential(self):
+        sequential, _ = self.build("sequential", jobs=1)
+        parallel, _ = self.build("parallel", jobs=2)
+        for name in ["index.html", "blog/post.html", "style.css"]:
+            self.assertEqual((sequential / name).read_text(),
+                             (parallel / name).read_text())
+
+    def test_async_io_build_matches_sequential(self):
+        sequential, _ = self.build("sequential", jobs=1)
+        pipelined, _ = self.build("pipelined", jobs=1, async_io=True)
+        for name in ["index.html", "blog/post.html", "style.css"]:
+            self.assertEqual((sequential / name).read_text(),
+                             (pipelined / name).read_text())
+        self.assertFalse((pipelined / "blog" / "broken.html").exists())
+
+    def test_errors_are_reported_per_file(self):
+        for jobs, async_io in [(1, False), (2, False), (1, True)]:
+            _, output = self.build(f"errors{jobs}{async_io}", jobs, async_io)
+            self.assertIn(
+                f"Error with {self.src / 'blog' / 'broken.md'}: No title found.",
+                output,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
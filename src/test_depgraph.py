@@ -0,0 +1,64 @@
+import unittest
+from depgraph import DependencyGraph, find_references, url_to_output
+from manifest import BuildManifest, hash_file
+from site_fixture import build_quietly, make_site
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        make_site(self, {
+            "index.md": "# Home\n\n![me](/images/me.png)\n\nand [a post](/blog/post)",
+            "blog/post.md": "# Post\n\nNo links",
+            "images/me.png": b"png",
+        })
+        self.graph_path = self.root / ".build-deps.json"
+
+    def build(self, manifest=None):
+        graph = DependencyGraph(self.graph_path).load()
+        build_quietly(self.src, self.dest, str(self.template), "/base/",
+                      manifest, graph=graph)
+        graph.save()
+        return DependencyGraph(self.graph_path).load()
+
+    def test_find_references(self):
+        self.assertEqual(
+            find_references('<a href="/blog">x</a><img src="/a.png" alt="">'
+                            '<a href="https://example.com">y</a>'),
+            ["/blog", "/a.png"],
+        )
+        self.assertEqual(url_to_output("/blog/post", "/site"),
+                         "/site/blog/post/index.html")
+        self.assertEqual(url_to_output("/a.png#top", "/site"), "/site/a.png")
+
+    def test_why(self):
+        graph = self.build()
+        self.assertEqual(graph.why(self.dest / "index.html"), [
+            ("source", str(self.src / "index.md")),
+            ("template", str(self.template)),
+            ("reference", str(self.dest / "blog" / "post" / "index.html")),
+            ("reference", str(self.dest / "images" / "me.png")),
+        ])
+
+    def test_affected(self):
+        graph = self.build()
+        self.assertEqual(graph.affected(self.src / "images" / "me.png"), [
+            ("rebuild", str(self.dest / "images" / "me.png")),
+            ("references", str(self.dest / "index.html")),
+        ])
+        self.assertEqual(graph.affected(self.template), [
+            ("rebuild", str(self.dest / "blog" / "post.html")),
+            ("rebuild", str(self.dest / "index.html")),
+        ])
+
+    def test_incremental_build_keeps_edges_of_fresh_outputs(self):
+        manifest_path = self.root / ".build-manifest.json"
+        for _ in range(2):
+            manifest = BuildManifest(manifest_path, hash_file(self.template),
+                                     "/base/").load()
+            graph = self.build(manifest)
+            manifest.save()
+        self.assertEqual(len(graph.why(self.dest / "index.html")), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
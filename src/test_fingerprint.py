@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from fingerprint import (AssetHashes, disable_fingerprints, enable_fingerprints,
+                         fingerprint_assets, fingerprinted_items, fingerprinted_name,
+                         fingerprints_version)
+from generate_content import Template
+from htmlnode import DEFERRED_URLS, LeafNode, RawNode, rewrite_urls
+from manifest import hash_file
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "cat.png").write_bytes(b"png")
+        (self.static / "about.html").write_text("<p>About</p>")
+        (self.static / ".nojekyll").write_text("")
+        self.hashes = AssetHashes(self.root / "assets.json")
+
+    def tearDown(self):
+        disable_fingerprints()
+        self.tmp.cleanup()
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(fingerprinted_name("index.css", "0123456789abcdef"),
+                         "index.0123456789.css")
+        self.assertEqual(fingerprinted_name("LICENSE", "0123456789abcdef"),
+                         "LICENSE.0123456789")
+
+    def test_fingerprint_assets(self):
+        css = hash_file(self.static / "index.css")[:10]
+        png = hash_file(self.static / "images" / "cat.png")[:10]
+        self.assertEqual(fingerprint_assets([self.static], self.hashes), {
+            "/index.css": f"/index.{css}.css",
+            "/images/cat.png": f"/images/cat.{png}.png",
+        })
+
+    def test_hashes_are_cached_by_mtime(self):
+        path = self.static / "index.css"
+        digest = self.hashes.hash(path)
+        self.hashes.save()
+
+        # Same size and mtime: trusted without reading the file
+        stat = path.stat()
+        path.write_text("body{ }")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        hashes = AssetHashes(self.root / "assets.json").load()
+        self.assertEqual(hashes.hash(path), digest)
+
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(hashes.hash(path), hash_file(path))
+
+    def test_urls_point_at_fingerprints(self):
+        enable_fingerprints({"/index.css": "/index.abc.css",
+                             "/images/cat.png": "/images/cat.def.png"})
+        image = LeafNode("img", "", {"src": "/images/cat.png", "alt": "cat"})
+        self.assertEqual(image.to_html("/"),
+                         '<img src="/images/cat.def.png" alt="cat"></img>')
+        self.assertEqual(image.to_html("/blog/"),
+                         '<img src="/blog/images/cat.def.png" alt="cat"></img>')
+        # Cached html is written root-relative and rewritten when written
+        self.assertEqual(image.to_html(), '<img src="/images/cat.png" alt="cat"></img>')
+        link = LeafNode("a", "x", {"href": "/index.css"})
+        self.assertEqual(RawNode(link.to_html(DEFERRED_URLS)).to_html("/"),
+                         '<a href="/index.abc.css">x</a>')
+        self.assertEqual(rewrite_urls("<img src=/images/cat.png srcset='/images/cat.png 2x'>",
+                                      "/b/"),
+                         "<img src=/b/images/cat.def.png srcset='/b/images/cat.def.png 2x'>")
+        template = Template('<link href="/index.css"><a href="/about">{{ Content }}')
+        self.assertEqual(template.segments[0], '<link href="/index.abc.css"><a href="/about">')
+
+    def test_fingerprinted_items(self):
+        enable_fingerprints({"/images/cat.png": "/images/cat.def.png"})
+        dest = self.root / "docs"
+        assets = [(self.static / "images" / "cat.png", dest / "images" / "cat.png"),
+                  (self.static / "index.css", dest / "index.css")]
+        self.assertEqual(fingerprinted_items(assets, dest),
+                         [(self.static / "images" / "cat.png",
+                           dest / "images" / "cat.def.png")])
+
+    def test_version_follows_the_fingerprints(self):
+        self.assertIsNone(fingerprints_version())
+        enable_fingerprints({"/a.css": "/a.1.css"})
+        first = fingerprints_version()
+        enable_fingerprints({"/a.css": "/a.2.css"})
+        self.assertNotEqual(fingerprints_version(), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,8 @@
 import unittest
-from generate_content import extract_title
+import tempfile
+from generate_content import extract_title, read_page, Template, apply_basepath
+from htmlnode import LeafNode
+from inline_markdown import markdown_to_html_node
 
 
 class TestGeneratePage(unittest.TestCase):
@@ -22,5 +25,58 @@ Here's the deal, **I like Tolkien**.
         )
 
 
+    def test_read_page(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".md") as file:
+            file.write("Intro\n\n# Tolkien **Fan** Club\n\n[Home](/)\n\nHello\n")
+            file.flush()
+            title, node, summary = read_page(file.name)
+        self.assertEqual(title, "Tolkien **Fan** Club")
+        self.assertEqual(summary, "Hello")
+        self.assertEqual(node.to_html(),
+                         "<div><p>Intro</p><h1>Tolkien <b>Fan</b> Club</h1>"
+                         '<p><a href="/">Home</a></p><p>Hello</p></div>')
+
+    def test_read_page_no_title(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".md") as file:
+            file.write("## Not a title\n\nHello\n")
+            file.flush()
+            with self.assertRaises(ValueError):
+                read_page(file.name)
+
+    def render(self, template, title, node, basepath="/"):
+        fragments = []
+        template.write(fragments.append, title, node, basepath)
+        return "".join(fragments)
+
+    def test_template_write(self):
+        template = Template(
+            '<title>{{ Title }}</title><link href="/index.css" />'
+            '<article>{{ Content }}</article>',
+            "/static-site-generator/",
+        )
+        node = LeafNode("img", "", {"src": "/images/tolkien.png"})
+        self.assertEqual(
+            self.render(template, "Tolkien", node, "/static-site-generator/"),
+            '<title>Tolkien</title>'
+            '<link href="/static-site-generator/index.css" />'
+            '<article><img src="/static-site-generator/images/tolkien.png">'
+            '</img></article>'
+        )
+
+    def test_template_repeated_and_missing_slots(self):
+        template = Template("{{ Title }} | {{ Title }}")
+        node = LeafNode(None, "ignored")
+        self.assertEqual(self.render(template, "Home", node), "Home | Home")
+        self.assertEqual(self.render(Template("static"), "Home", node), "static")
+
+    def test_template_write_prefixes_body_urls(self):
+        template = Template('<link href="/index.css" />{{ Content }}', "/base/")
+        node = markdown_to_html_node("[home](/index.html) ![x](/images/x.png)")
+        self.assertEqual(
+            self.render(template, "Home", node, "/base/"),
+            '<link href="/base/index.css" />'
+            + apply_basepath(node.to_html(), "/base/"),
+        )
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
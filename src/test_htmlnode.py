@@ -1,5 +1,6 @@
 import unittest
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import (DEFERRED_URLS, HTMLNode, LeafNode, ParentNode, RawNode,
+                      rewrite_urls)
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -110,6 +111,61 @@ class TestHTMLNode(unittest.TestCase):
                           '<div><section><article><p><b>very deep text</b>'
                           '</p></article></section></div>')
 
+    def test_write_html_to_file_like(self):
+        import io
+        parent = ParentNode("ul", [ParentNode("li", [LeafNode("b", "one")]),
+                                   ParentNode("li", [LeafNode(None, "two")])],
+                            {"class": "list"})
+        sink = io.StringIO()
+        parent.write_html(sink.write)
+        self.assertEqual(sink.getvalue(), parent.to_html())
+        self.assertEqual(sink.getvalue(),
+                         '<ul class="list"><li><b>one</b></li><li>two</li></ul>')
+
+    def test_nodes_have_no_instance_dict(self):
+        leaf = LeafNode("b", "bold")
+        parent = ParentNode("p", [leaf])
+        for node in [HTMLNode(), leaf, parent]:
+            self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIs(leaf.children, LeafNode("i", "other").children)
+        self.assertEqual(len(leaf.children), 0)
+
+    def test_to_html_with_basepath(self):
+        parent = ParentNode("p", [
+            LeafNode("a", "post", {"href": "/blog/post"}),
+            LeafNode("a", "out", {"href": "https://boot.dev"}),
+            LeafNode("img", "", {"src": "/images/a.png", "alt": "/not-a-url"}),
+            LeafNode("a", "cdn", {"href": "//cdn.example.com/x"}),
+        ])
+        self.assertEqual(
+            parent.to_html("/site/"),
+            '<p><a href="/site/blog/post">post</a><a href="https://boot.dev">out</a>'
+            '<img src="/site/images/a.png" alt="/not-a-url"></img>'
+            '<a href="//cdn.example.com/x">cdn</a></p>')
+        self.assertEqual(parent.to_html("/"), parent.to_html())
+
+    def test_rewrite_urls(self):
+        html = ("<link href='/index.css'><video poster=\"/p.png\" src=/v.mp4>"
+                '<img srcset="/a.png 1x, /b.png 2x, https://c/d.png 3x">'
+                '<a href="https://boot.dev">x</a>')
+        self.assertEqual(
+            rewrite_urls(html, "/site/"),
+            "<link href='/site/index.css'><video poster=\"/site/p.png\" src=/site/v.mp4>"
+            '<img srcset="/site/a.png 1x, /site/b.png 2x, https://c/d.png 3x">'
+            '<a href="https://boot.dev">x</a>')
+
+    def test_raw_node(self):
+        self.assertEqual(RawNode('<a href="/x">x</a>').to_html("/site/"),
+                         '<a href="/x">x</a>')
+        link = LeafNode("a", "x", {"href": "/x", "srcset": "/a.png 2x"})
+        node = RawNode(link.to_html(DEFERRED_URLS))
+        self.assertEqual(node.to_html(), link.to_html())
+        self.assertEqual(node.to_html("/site/"),
+                         '<a href="/site/x" srcset="/site/a.png 2x">x</a>')
+        page = ParentNode("p", [node])
+        self.assertEqual(RawNode(page.to_html(DEFERRED_URLS)).to_html("/site/"),
+                         '<p><a href="/site/x" srcset="/site/a.png 2x">x</a></p>')
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,3 +1,5 @@
+import random
+import time
 import unittest
 from textnode import TextNode, TextType
 from inline_markdown import (BlockType,
@@ -282,6 +284,70 @@ class TestMarkdownToTextNode(unittest.TestCase):
             )
             split_nodes_image([node])        
 
+    def test_text_to_textnodes_matches_legacy(self):
+        texts = [
+            "This is **text** with an _italic_ word and a `code block` and an "
+            "![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) "
+            "and a [link](https://boot.dev)",
+            "[first](/a) then [second](/b) and ![img](/c.png) **end**",
+            "plain text only",
+            "**bold at start** and `code at end`",
+        ]
+        for text in texts:
+            self.assertListEqual(text_to_textnodes(text),
+                                 text_to_textnodes(text, legacy=True))
+
+    def test_text_to_textnodes_matches_legacy_on_odd_input(self):
+        # A stray bracket and a link before an image are what the legacy
+        # passes accept (or leave as text) in their own way
+        for text in ["Note [draft: see [the guide](/guide) later",
+                     "Read [the guide](/guide) and ![logo](/logo.png)",
+                     "![logo](/logo.png) **b** [the guide](/guide)"]:
+            self.assertEqual(self.outcome(text), self.outcome(text, legacy=True))
+
+    def test_text_to_textnodes_matches_legacy_fuzzed(self):
+        tokens = ["a", " ", "**", "_", "`", "[", "]", "(", ")", "!", "![",
+                  "](", "[x](/x)", "![i](/i.png)", "*"]
+        rng = random.Random(0)
+        for _ in range(5000):
+            text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 10)))
+            self.assertEqual(self.outcome(text), self.outcome(text, legacy=True),
+                             text)
+
+    def outcome(self, text, legacy=False):
+        try:
+            return text_to_textnodes(text, legacy)
+        except (ValueError, IndexError) as error:
+            return type(error), str(error)
+
+    def test_text_to_textnodes_many_links(self):
+        text = " ".join(f"[link {i}](/page{i})" for i in range(50))
+        nodes = text_to_textnodes(text)
+        self.assertEqual(len(nodes), 99)
+        self.assertEqual(nodes[-1], TextNode("link 49", TextType.LINK, "/page49"))
+
+    def test_text_to_textnodes_scales_linearly(self):
+        def seconds(spans):
+            text = " ".join(f"**b{i}** _i{i}_ [l{i}](/l{i}) ![m{i}](/m{i}.png)"
+                            for i in range(spans))
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                nodes = text_to_textnodes(text)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            self.assertEqual(len(nodes), 8 * spans - 1)
+            return best
+
+        # 4x the spans: 4x the time when linear, 16x when quadratic
+        self.assertLess(seconds(4000) / seconds(1000), 8)
+
+    def test_text_to_textnodes_invalid_markdown(self):
+        for text in ["a **missing delimiter", "an ![image(/x.png)",
+                     "a [link to boot dev]https://www.boot.dev)"]:
+            with self.assertRaises(ValueError):
+                text_to_textnodes(text)
+
 
 class TestExtractMarkdownLinksAndImages(unittest.TestCase):
     def test_extract_images(self):
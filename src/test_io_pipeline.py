@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from io_pipeline import IOPipeline
+
+
+class TestIOPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_ahead_keeps_order(self):
+        items = []
+        for i in range(10):
+            path = self.root / f"{i}.md"
+            path.write_text(f"page {i}")
+            items.append((path, self.root / f"{i}.html"))
+        pipeline = IOPipeline(workers=4, prefetch=3)
+        read = [(src, dest, text.result())
+                for src, dest, text in pipeline.read_ahead(items)]
+        pipeline.close()
+        self.assertEqual(read, [(src, dest, f"page {i}")
+                                for i, (src, dest) in enumerate(items)])
+
+    def test_read_errors_are_raised_by_the_future(self):
+        pipeline = IOPipeline()
+        missing = self.root / "missing.md"
+        [(_, _, text)] = pipeline.read_ahead([(missing, self.root / "x.html")])
+        with self.assertRaises(FileNotFoundError):
+            text.result()
+        pipeline.close()
+
+    def test_writes_are_flushed_in_batches(self):
+        pipeline = IOPipeline(max_pending_writes=2)
+        for i in range(5):
+            pipeline.write(i, self.root / "out" / f"{i}.html", ["<p>", str(i), "</p>"])
+            self.assertLess(len(pipeline.pending), 2)
+        self.assertEqual(pipeline.close(), [])
+        self.assertEqual((self.root / "out" / "3.html").read_text(), "<p>3</p>")
+        self.assertEqual(pipeline.created_dirs, {str(self.root / "out")})
+
+    def test_write_errors_are_returned(self):
+        (self.root / "file").write_text("")
+        pipeline = IOPipeline()
+        pipeline.write("page.md", os.path.join(self.root, "file", "page.html"), ["x"])
+        [(src_item, exception)] = pipeline.close()
+        self.assertEqual(src_item, "page.md")
+        self.assertIsInstance(exception, OSError)
+
+
+if __name__ == "__main__":
+    unittest.main()
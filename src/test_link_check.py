@@ -0,0 +1,91 @@
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from config import SiteConfig
+from link_check import (check_command, check_site, generated_outputs, page_references,
+                        resolve_url, site_index)
+
+
+class TestLinkCheck(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.content = root / "content"
+        self.static = root / "static"
+        (self.content / "blog" / "post").mkdir(parents=True)
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "images" / "cat.png").write_bytes(b"png")
+        (self.static / "index.css").write_text("body {}")
+        (self.content / "index.md").write_text(
+            "# Home\n\n![cat](/images/cat.png)\n\n[post](/blog/post)\n\n"
+            "- [missing](/blog/missing)\n- [external](https://example.com/x)\n\n"
+            "```\n[not a link](/nowhere)\n```")
+        (self.content / "blog" / "post" / "index.md").write_text(
+            "# Post\n\n> [home](../../)\n\n![dog](dog.png)\n\n[top](#top)")
+        self.template = root / "template.html"
+        self.template.write_text('<link href="/index.css"><a href="/about">')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_site_index(self):
+        self.assertEqual(site_index([self.content, self.static]), {
+            "index.html", "blog/post/index.html", "images/cat.png", "index.css"})
+
+    def test_page_references_skip_code(self):
+        self.assertEqual(page_references(self.content / "index.md"), [
+            ("src", "/images/cat.png"), ("href", "/blog/post"),
+            ("href", "/blog/missing"), ("href", "https://example.com/x")])
+
+    def test_resolve_url(self):
+        page = "blog/post/index.html"
+        self.assertEqual(resolve_url("/", page), "index.html")
+        self.assertEqual(resolve_url("/blog/post/", page), "blog/post/index.html")
+        self.assertEqual(resolve_url("../../", page), "index.html")
+        self.assertEqual(resolve_url("dog.png?v=1", page), "blog/post/dog.png")
+        self.assertEqual(resolve_url("/a%20b.png", page), "a b.png")
+        for url in ["#top", "https://example.com", "//cdn.example.com/x.js",
+                    "mailto:me@example.com"]:
+            self.assertIsNone(resolve_url(url, page))
+
+    def test_check_site(self):
+        for jobs in [1, 2]:
+            pages, references, problems = check_site(
+                [self.content, self.static], self.template, jobs)
+            self.assertEqual(pages, 2)
+            self.assertEqual(references, 9)
+            self.assertEqual(sorted(message for _, message in problems), [
+                'broken href "/blog/missing"',
+                'broken src "dog.png"',
+                'broken url "/about"',
+            ])
+
+    def test_generated_outputs_are_not_broken(self):
+        self.template.write_text('<link href="/sitemap.xml"><a href="/blog/feed.xml">'
+                                 '<a href="/search/index.json">')
+        config = SiteConfig().update({"content": self.content, "static": self.static,
+                                      "site_url": "https://example.com",
+                                      "search": True})
+        self.assertEqual(generated_outputs(config), {
+            "sitemap.xml", "blog/feed.xml", "search/index.json", "search/docs.json"})
+        _, _, problems = check_site([self.content, self.static], self.template,
+                                    generated=generated_outputs(config))
+        self.assertEqual(sorted(message for _, message in problems), [
+            'broken href "/blog/missing"', 'broken src "dog.png"'])
+        self.assertEqual(generated_outputs(SiteConfig()), set())
+
+    def test_check_command_exit_status(self):
+        argv = ["--static", str(self.static), "--content", str(self.static),
+                "--template", str(self.template)]
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(check_command(argv), 1)
+            self.template.write_text('<link href="/index.css">')
+            self.assertEqual(check_command(argv), 0)
+        self.assertIn("0 problem(s)", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+from fingerprint import disable_fingerprints, enable_fingerprints
+from manifest import BuildManifest, hash_file
+from site_fixture import PAGES, build_quietly, make_site
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        make_site(self, {**PAGES, "style.css": "body {}"})
+        self.manifest_path = self.root / ".build-manifest.json"
+
+    def build(self):
+        manifest = BuildManifest(self.manifest_path, hash_file(self.template),
+                                 "/").load()
+        build_quietly(self.src, self.dest, str(self.template), "/", manifest)
+        removed = manifest.remove_stale_outputs()
+        manifest.save()
+        return manifest, removed
+
+    def test_unchanged_outputs_are_kept(self):
+        self.build()
+        page = self.dest / "index.html"
+        os.utime(page, (0, 0))
+        self.build()
+        self.assertEqual(page.stat().st_mtime, 0)
+
+    def test_changed_source_is_rebuilt(self):
+        self.build()
+        (self.src / "index.md").write_text("# Home\n\nChanged")
+        os.utime(self.dest / "blog" / "post.html", (0, 0))
+        self.build()
+        self.assertIn("Changed", (self.dest / "index.html").read_text())
+        self.assertEqual((self.dest / "blog" / "post.html").stat().st_mtime, 0)
+
+    def test_template_change_rebuilds_pages(self):
+        self.build()
+        self.template.write_text("<h1>{{ Title }}</h1>{{ Content }}")
+        self.build()
+        self.assertIn("<h1>Home</h1>", (self.dest / "index.html").read_text())
+
+    def test_asset_change_only_rebuilds_pages_using_it(self):
+        (self.src / "index.md").write_text("# Home\n\n![a](/a.png)")
+        (self.src / "blog" / "post.md").write_text("# Post\n\n![b](/b.png)")
+        home = self.dest / "index.html"
+        post = self.dest / "blog" / "post.html"
+
+        def build(fingerprints):
+            enable_fingerprints(fingerprints)
+            try:
+                manifest = BuildManifest(self.manifest_path, hash_file(self.template),
+                                         "/", fingerprints).load()
+                build_quietly(self.src, self.dest, str(self.template), "/", manifest)
+                manifest.save()
+            finally:
+                disable_fingerprints()
+
+        build({"/a.png": "/a.1.png", "/b.png": "/b.1.png"})
+        os.utime(home, (0, 0))
+        os.utime(post, (0, 0))
+        build({"/a.png": "/a.1.png", "/b.png": "/b.2.png"})
+        self.assertEqual(home.stat().st_mtime, 0)
+        self.assertIn("/b.2.png", post.read_text())
+
+        # A page linking to a file that wasn't fingerprinted yet
+        (self.src / "blog" / "post.md").write_text("# Post\n\n![c](/c.png)")
+        build({"/a.png": "/a.1.png"})
+        os.utime(post, (0, 0))
+        build({"/a.png": "/a.1.png", "/c.png": "/c.1.png"})
+        self.assertEqual(home.stat().st_mtime, 0)
+        self.assertIn("/c.1.png", post.read_text())
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        (self.src / "blog" / "post.md").unlink()
+        _, removed = self.build()
+        self.assertEqual(removed, [str(self.dest / "blog" / "post.html")])
+        self.assertFalse((self.dest / "blog" / "post.html").exists())
+        self.assertTrue((self.dest / "style.css").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from depgraph import find_references
+from generate_content import Template
+from htmlnode import LeafNode, ParentNode
+from inline_markdown import markdown_to_html_node
+from minify import (attribute, collapse_whitespace, disable_minify, enable_minify,
+                    minify_template)
+from render_cache import RenderCache
+
+
+class TestMinify(unittest.TestCase):
+    def tearDown(self):
+        disable_minify()
+
+    def test_collapse_whitespace(self):
+        self.assertEqual(collapse_whitespace("a  b\n\tc "), "a b c ")
+        self.assertEqual(collapse_whitespace("a b"), "a b")
+
+    def test_attribute_quotes_only_when_needed(self):
+        self.assertEqual(attribute("href", "/blog/tom"), " href=/blog/tom")
+        self.assertEqual(attribute("alt", "JRR Tolkien"), ' alt="JRR Tolkien"')
+        self.assertEqual(attribute("alt", ""), ' alt=""')
+        self.assertEqual(attribute("title", "a=b"), ' title="a=b"')
+
+    def test_minify_template(self):
+        template = ("<html>\n  <head>\n    <title>{{ Title }}</title>\n  </head>\n"
+                    "  <body>\n    <b>a</b> <i>b</i>\n"
+                    "    <pre>\n  kept\n    as is</pre>\n  </body>\n</html>\n")
+        self.assertEqual(minify_template(template),
+                         "<html><head><title>{{ Title }}</title></head><body>"
+                         "<b>a</b> <i>b</i><pre>\n  kept\n    as is</pre>"
+                         "</body></html>")
+
+    def test_minify_template_keeps_breaks_between_inline_tags(self):
+        self.assertEqual(minify_template("<p>\n  <b>a</b>\n  <i>b</i>\n</p>\n"
+                                         "<ul>\n  <li>x</li>\n</ul>"),
+                         "<p><b>a</b> <i>b</i></p><ul><li>x</li></ul>")
+        self.assertEqual(minify_template("<!DOCTYPE html>\n<html>\n"
+                                         "  <a href=/>home</a>\n  text\n</html>"),
+                         "<!DOCTYPE html><html><a href=/>home</a> text</html>")
+
+    def test_serialization_keeps_pre(self):
+        node = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "Some   spaced\ntext "),
+                             LeafNode("a", "link", {"href": "/x", "class": "a b"})]),
+            ParentNode("pre", [LeafNode("code", "def f():\n    return  1\n")]),
+        ])
+        enable_minify()
+        self.assertEqual(
+            node.to_html("/base/"),
+            '<div><p>Some spaced text <a href=/base/x class="a b">link</a></p>'
+            "<pre><code>def f():\n    return  1\n</code></pre></div>")
+
+    def test_markdown_page(self):
+        enable_minify()
+        html = markdown_to_html_node("A   [link](/a)\n\n```\nx  =  1\n```").to_html()
+        self.assertEqual(html, "<div><p>A <a href=/a>link</a></p>"
+                               "<pre><code>x  =  1\n</code></pre></div>")
+        self.assertEqual(find_references(html), ["/a"])
+
+    def test_template(self):
+        template = Template('<head>\n  <link href="/index.css" rel="stylesheet" />\n'
+                            '</head>\n{{ Content }}', "/base/", minify=True)
+        self.assertEqual(template.segments[0],
+                         '<head><link href=/base/index.css rel=stylesheet /></head>')
+        # Quotes stay where the value needs them, or would after the basepath
+        template = Template('<img src="/a.png" alt="A cat" srcset="/a.png"/>'
+                            "<a title='say \"hi\"' href='/x'>{{ Content }}",
+                            "/my site/", minify=True)
+        self.assertEqual(template.segments[0],
+                         '<img src="/my site/a.png" alt="A cat" srcset="/my site/a.png"/>'
+                         "<a title='say \"hi\"' href=\"/my site/x\">")
+
+    def test_render_cache_keys_differ(self):
+        plain = RenderCache.key("block")
+        enable_minify()
+        self.assertNotEqual(RenderCache.key("block"), plain)
+
+
+if __name__ == "__main__":
+    unittest.main()
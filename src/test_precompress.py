@@ -0,0 +1,72 @@
+import gzip
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from manifest import BuildManifest
+from precompress import compress_file, encoders, precompress_tree
+from staging import detach_output
+
+
+class TestPrecompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / "blog").mkdir()
+        self.page = self.root / "blog" / "index.html"
+        self.page.write_text("<p>Hello</p>" * 100)
+        (self.root / "index.css").write_text("body { color: red; }\n" * 50)
+        (self.root / "tiny.css").write_text("a {}")
+        (self.root / "cat.png").write_bytes(b"png" * 200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_precompress_tree(self):
+        written, errors = precompress_tree(self.root, jobs=2)
+        self.assertEqual(errors, [])
+        self.assertTrue((self.root / "index.css.gz").exists())
+        self.assertEqual(gzip.decompress(Path(f"{self.page}.gz").read_bytes()),
+                         self.page.read_bytes())
+        self.assertFalse((self.root / "tiny.css.gz").exists())
+        self.assertFalse((self.root / "cat.png.gz").exists())
+        # The page and index.css, once per available encoding
+        self.assertEqual(written, 2 * len(encoders()))
+
+    def test_up_to_date_siblings_are_skipped(self):
+        written, made_from = compress_file(str(self.page))
+        self.assertGreater(written, 0)
+        self.assertEqual(compress_file(str(self.page), made_from=made_from),
+                         (0, made_from))
+
+        # Replaced by a file with an older mtime, e.g. by cp -p
+        self.page.write_text("<p>Changed</p>" * 100)
+        os.utime(self.page, ns=(0, 0))
+        self.assertGreater(compress_file(str(self.page), made_from=made_from)[0], 0)
+        self.assertEqual(gzip.decompress(Path(f"{self.page}.gz").read_bytes()),
+                         self.page.read_bytes())
+
+    def test_record_skips_unchanged_outputs(self):
+        record = self.root.parent / f"{self.root.name}.json"
+        self.addCleanup(record.unlink)
+        self.assertGreater(precompress_tree(self.root, 1, record)[0], 0)
+        self.assertEqual(precompress_tree(self.root, 1, record), (0, []))
+        # A rewritten output loses its siblings, whatever its mtime
+        stat = self.page.stat()
+        detach_output(self.page)
+        self.page.write_text("<p>Hello</p>" * 100)
+        os.utime(self.page, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertFalse(Path(f"{self.page}.gz").exists())
+        self.assertEqual(precompress_tree(self.root, 1, record),
+                         (len(encoders()), []))
+
+    def test_stale_outputs_lose_their_siblings(self):
+        compress_file(str(self.page))
+        manifest = BuildManifest(self.root / "manifest.json")
+        manifest.previous = {str(self.page): {}}
+        manifest.remove_stale_outputs()
+        self.assertEqual(list((self.root / "blog").iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
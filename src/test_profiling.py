@@ -0,0 +1,69 @@
+import json
+import unittest
+from profiling import BuildProfile, record_work_item, stage
+from site_fixture import build_quietly, make_site
+
+
+class TestProfiling(unittest.TestCase):
+    def test_nested_stages_are_exclusive(self):
+        def work():
+            with stage("outer"):
+                with stage("inner"):
+                    pass
+            return "done"
+
+        result, record = record_work_item("page.md", "page", work)
+        self.assertEqual(result, "done")
+        self.assertEqual(set(record["stages"]), {"other", "outer", "inner"})
+        self.assertAlmostEqual(
+            record["wall"],
+            sum(stage["wall"] for stage in record["stages"].values()),
+        )
+
+    def test_stage_is_a_no_op_without_recorder(self):
+        with stage("anything"):
+            pass
+
+    def test_profiled_build(self):
+        make_site(self, {"index.md": "# Home\n\n- a [link](/x)\n- b",
+                         "style.css": "body {}"})
+        src = self.src
+
+        profile = BuildProfile()
+        build_quietly(src, self.dest, str(self.template), "/", profile=profile)
+        profile.finish()
+
+        kinds = {record["path"]: record["kind"] for record in profile.records}
+        self.assertEqual(kinds, {str(src / "index.md"): "page",
+                                 str(src / "style.css"): "file"})
+        stages = profile.stage_totals()
+        for name in ["read", "markdown_to_blocks", "block classification",
+                     "inline parsing", "to_html", "template", "write", "copy"]:
+            self.assertIn(name, stages)
+        self.assertIn(str(src / "index.md"), profile.report())
+
+        report_path = self.root / "profile.json"
+        profile.dump_json(report_path)
+        report = json.loads(report_path.read_text())
+        self.assertEqual(len(report["records"]), 2)
+
+    def test_profiled_async_io_build_records_reads_and_writes(self):
+        make_site(self, {f"{name}.md": f"# {name}\n\ntext"
+                         for name in ["index", "about"]})
+
+        profile = BuildProfile()
+        build_quietly(self.src, self.dest, str(self.template), "/", profile=profile,
+                      async_io=True)
+
+        self.assertEqual(len(profile.records), 2)
+        for record in profile.records:
+            self.assertIn("read", record["stages"])
+            self.assertIn("write", record["stages"])
+            self.assertAlmostEqual(
+                record["wall"],
+                sum(stage["wall"] for stage in record["stages"].values()),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+import render_cache
+from generate_content import generate_pages
+from inline_markdown import markdown_to_html_node
+from render_cache import PageCache, RenderCache
+
+
+class TestRenderCache(unittest.TestCase):
+    def tearDown(self):
+        render_cache.disable_cache()
+
+    def test_cached_render_matches_uncached(self):
+        md = "# Title\n\nA **footer** with a [link](/x)\n\n- a\n- b\n\nA **footer** with a [link](/x)"
+        expected = markdown_to_html_node(md).to_html()
+        cache = render_cache.enable_cache()
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.hits, 5)
+
+    def test_cached_render_keeps_url_text_as_written(self):
+        md = ("Write `<img src=\"/x.png\">` in html, or set src=/x.png\n\n"
+              "![logo](/x.png) and [home](/)")
+        for basepath in (None, "/", "/base/"):
+            expected = markdown_to_html_node(md).to_html(basepath)
+            render_cache.enable_cache()
+            markdown_to_html_node(md).to_html(basepath)
+            self.assertEqual(markdown_to_html_node(md).to_html(basepath), expected)
+            render_cache.disable_cache()
+        self.assertIn("src=/x.png", expected)
+        self.assertIn('src="/base/x.png"', expected)
+
+    def test_memory_tier_evicts_by_size(self):
+        cache = RenderCache(max_bytes=10)
+        cache.put("a", "12345")
+        cache.put("b", "12345")
+        cache.get("a")
+        cache.put("c", "12345")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "12345")
+        self.assertEqual(cache.get("c"), "12345")
+
+    def test_disk_tier_survives_between_caches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            RenderCache(cache_dir=tmp).put("block", "<p>block</p>")
+            self.assertEqual(RenderCache(cache_dir=tmp).get("block"), "<p>block</p>")
+
+    def test_prune_drops_old_versions_and_oversize_entries(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            stale = os.path.join(tmp, "blocks", "v0")
+            os.makedirs(stale)
+            cache = RenderCache(cache_dir=tmp, max_disk_bytes=10)
+            cache.put("old", "123456")
+            os.utime(cache._disk_path(cache.key("old")), (0, 0))
+            cache.put("new", "123456")
+            cache.prune()
+            self.assertFalse(os.path.exists(stale))
+            fresh = RenderCache(cache_dir=tmp)
+            self.assertIsNone(fresh.get("old"))
+            self.assertEqual(fresh.get("new"), "123456")
+
+
+class TestPageCache(unittest.TestCase):
+    def tearDown(self):
+        render_cache.disable_cache()
+
+    def test_basepath_variants_parse_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            source = root / "index.md"
+            source.write_text("# Home\n\n[post](/blog/post)\n\n![me](/me.png)")
+            template = root / "template.html"
+            template.write_text('<link href="/index.css">{{ Title }}{{ Content }}')
+
+            with redirect_stdout(io.StringIO()):
+                expected = [generate_pages(source, template, root / name, basepath)
+                            for name, basepath in [("a.html", "/"),
+                                                   ("b.html", "/prod/")]]
+                cache = render_cache.enable_page_cache(root / "cache")
+                actual = [generate_pages(source, template, root / name, basepath)
+                          for name, basepath in [("c.html", "/"),
+                                                 ("d.html", "/prod/")]]
+
+            self.assertEqual((cache.misses, cache.hits), (1, 1))
+            self.assertEqual(actual, expected)
+            self.assertEqual((root / "a.html").read_text(),
+                             (root / "c.html").read_text())
+            self.assertEqual((root / "b.html").read_text(),
+                             (root / "d.html").read_text())
+            self.assertIn('href="/prod/blog/post"', (root / "d.html").read_text())
+
+    def test_cached_page_keeps_url_text_as_written(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            template = root / "template.html"
+            template.write_text("{{ Title }}{{ Content }}")
+            pages = {
+                "code.md": "# Code\n\nWrite `<img src=\"/x.png\">` in html, "
+                           "or set src=/x.png\n\n![x](/x.png)",
+                "nul.md": "# Nul\n\nA \x00 and [home](/)",
+            }
+            expected = {}
+            with redirect_stdout(io.StringIO()):
+                for name, markdown in pages.items():
+                    source = root / name
+                    source.write_text(markdown)
+                    generate_pages(source, template, root / "page.html", "/base/")
+                    expected[name] = (root / "page.html").read_text()
+                    render_cache.enable_page_cache(root / "cache")
+                    for _ in range(2):
+                        generate_pages(source, template, root / "page.html", "/base/")
+                        self.assertEqual((root / "page.html").read_text(),
+                                         expected[name])
+                    render_cache.disable_cache()
+
+            self.assertIn("set src=/x.png", expected["code.md"])
+            self.assertIn('src="/base/x.png"', expected["code.md"])
+            self.assertIn('href="/base/"', expected["nul.md"])
+
+    def test_entries_of_other_versions_are_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PageCache(tmp)
+            cache.store("abcd", "Title", "<p>body</p>", "body", "Title\nbody")
+            self.assertEqual(cache.load("abcd"),
+                             ("Title", "<p>body</p>", "body", "Title\nbody"))
+            with open(cache._path("abcd"), "wb") as file:
+                file.write(b"SSGP0\n" + b"garbage")
+            self.assertIsNone(cache.load("abcd"))
+
+
+if __name__ == "__main__":
+    unittest.main()
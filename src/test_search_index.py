@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from inline_markdown import markdown_to_html_node
+from render_cache import disable_cache, enable_cache
+from search_index import (InvertedIndexWriter, count_terms, decode_postings,
+                          delta_encode, load_page_terms, record_page_terms,
+                          shard_name, tokenize, write_search_index)
+
+
+MARKDOWN = """# The _Hobbit_
+
+A **hobbit** hole, ![a door](/door.png) and [a map](/map).
+
+- Bilbo
+- Gandalf
+
+```
+ring = find()
+```
+"""
+
+
+class TestPlainText(unittest.TestCase):
+    def test_markdown_to_html_node_captures_text(self):
+        plain_text = []
+        markdown_to_html_node(MARKDOWN, plain_text)
+        self.assertEqual(plain_text, ["The Hobbit", "A hobbit hole,  and a map.",
+                                      "Bilbo", "Gandalf", "ring = find()\n"])
+
+    def test_cached_blocks_give_the_same_text(self):
+        expected = []
+        markdown_to_html_node(MARKDOWN, expected)
+        enable_cache()
+        try:
+            for _ in range(2):
+                plain_text = []
+                markdown_to_html_node(MARKDOWN, plain_text)
+                self.assertEqual(plain_text, expected)
+        finally:
+            disable_cache()
+
+    def test_tokenize(self):
+        self.assertEqual(list(tokenize("Frodo's ring, a RING: Éowyn 42")),
+                         ["frodo", "ring", "ring", "éowyn", "42"])
+        self.assertEqual(count_terms(["ring ring", "Ring"]), {"ring": 3})
+
+
+class TestInvertedIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_delta_encoding(self):
+        postings = [3, 1, 7, 2, 20, 5]
+        self.assertEqual(delta_encode(postings), [3, 1, 4, 2, 13, 5])
+        self.assertEqual(decode_postings(delta_encode(postings)),
+                         [(3, 1), (7, 2), (20, 5)])
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name("ri"), "ri")
+        self.assertEqual(shard_name("éo"), "xc3a96f")
+
+    def build(self, name, max_postings):
+        out_dir = self.root / name
+        out_dir.mkdir()
+        writer = InvertedIndexWriter(str(out_dir), max_postings)
+        writer.add(0, {"ring": 2, "frodo": 1})
+        writer.add(1, {"ring": 1, "riddle": 4})
+        writer.add(2, {"frodo": 3})
+        shards, terms = writer.finish()
+        files = {name: (out_dir / name).read_text() for name in os.listdir(out_dir)}
+        return shards, terms, files
+
+    def test_spilled_runs_merge_into_the_same_shards(self):
+        in_memory = self.build("memory", 100)
+        self.assertEqual(self.build("spilled", 1), in_memory)
+        shards, terms, files = in_memory
+        self.assertEqual(shards, {"fr": "terms-fr.json", "ri": "terms-ri.json"})
+        self.assertEqual(terms, 3)
+        self.assertEqual(json.loads(files["terms-ri.json"]),
+                         {"riddle": [1, 4], "ring": [0, 2, 1, 1]})
+        self.assertEqual(json.loads(files["terms-fr.json"]), {"frodo": [0, 1, 2, 3]})
+
+    def test_write_search_index(self):
+        terms_dir = self.root / "terms"
+        terms_dir.mkdir()
+        dest = self.root / "docs"
+        dest.mkdir()
+        page = self.root / "ring.md"
+        page.write_text("# One Ring\n\nTo rule them all")
+        record_page_terms(page, ["unused"], terms_dir)
+        (terms_dir / "stale.terms").write_text("")
+        # The page changed since its terms were recorded: it is parsed again
+        os.utime(page, ns=(0, 0))
+        self.assertIsNone(load_page_terms(terms_dir, page))
+
+        entries = [("/ring.html", {"title": "One Ring", "source": str(page)})]
+        self.assertEqual(write_search_index(dest, entries, terms_dir, "/base/"),
+                         (1, 6, 1))
+        index = json.loads((dest / "search" / "index.json").read_text())
+        self.assertEqual(index["documents"], 1)
+        self.assertEqual(index["shards"]["ru"], "terms-ru.json")
+        self.assertEqual(json.loads((dest / "search" / "docs.json").read_text()),
+                         [["/base/ring.html", "One Ring"]])
+        self.assertEqual(load_page_terms(terms_dir, page)["rule"], 1)
+        self.assertEqual(len(os.listdir(terms_dir)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from serve import RELOAD_SCRIPT, Watcher, inject_reload_script, rebuild
+from site_fixture import build_quietly, make_site
+
+
+class TestServe(unittest.TestCase):
+    def setUp(self):
+        make_site(self)
+        build_quietly(self.src, self.dest, str(self.template), "/")
+
+    def touch(self, path, text):
+        path.write_text(text)
+        # Make sure the change is visible even on coarse mtime filesystems
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def rebuild(self, watcher):
+        changed, removed = watcher.poll()
+        with redirect_stdout(io.StringIO()):
+            return rebuild(changed, removed, [self.src], self.dest,
+                           str(self.template), "/")
+
+    def test_watcher_reports_changes(self):
+        watcher = Watcher([self.src, self.template])
+        self.assertEqual(watcher.poll(), ([], []))
+        self.touch(self.src / "index.md", "# Home\n\nEdited")
+        (self.src / "blog" / "post.md").unlink()
+        self.assertEqual(watcher.poll(), ([self.src / "index.md"],
+                                          [self.src / "blog" / "post.md"]))
+
+    def test_rebuild_only_changed_page(self):
+        watcher = Watcher([self.src, self.template])
+        os.utime(self.dest / "blog" / "post.html", (0, 0))
+        self.touch(self.src / "index.md", "# Home\n\nEdited")
+        self.assertEqual(self.rebuild(watcher), 1)
+        self.assertIn("Edited", (self.dest / "index.html").read_text())
+        self.assertEqual((self.dest / "blog" / "post.html").stat().st_mtime, 0)
+
+    def test_template_change_rebuilds_all_pages(self):
+        watcher = Watcher([self.src, self.template])
+        self.touch(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(self.rebuild(watcher), 2)
+        self.assertIn("<h1>Post</h1>",
+                      (self.dest / "blog" / "post.html").read_text())
+
+    def test_template_change_still_copies_changed_assets(self):
+        watcher = Watcher([self.src, self.template])
+        self.touch(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.touch(self.src / "index.css", "body { color: red }")
+        self.assertEqual(self.rebuild(watcher), 3)
+        self.assertEqual((self.dest / "index.css").read_text(),
+                         "body { color: red }")
+
+    def test_removed_source_deletes_output(self):
+        watcher = Watcher([self.src, self.template])
+        (self.src / "blog" / "post.md").unlink()
+        self.rebuild(watcher)
+        self.assertFalse((self.dest / "blog" / "post.html").exists())
+
+    def test_inject_reload_script(self):
+        self.assertEqual(inject_reload_script("<body>hi</body></html>"),
+                         f"<body>hi{RELOAD_SCRIPT}</body></html>")
+
+
+if __name__ == "__main__":
+    unittest.main()
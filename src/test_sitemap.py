@@ -0,0 +1,83 @@
+import os
+import unittest
+import xml.etree.ElementTree as ElementTree
+from manifest import BuildManifest, hash_file
+from page_index import PageIndex, page_url
+from site_fixture import build_quietly, make_site
+from sitemap import ATOM_NAMESPACE, SITEMAP_NAMESPACE, write_feed, write_sitemap
+
+
+class TestSitemap(unittest.TestCase):
+    def setUp(self):
+        make_site(self, {
+            "index.md": "# Home & away\n\nWelcome _home_.",
+            "blog/old.md": "# Old\n\nFirst post",
+            "blog/new.md": "# New\n\nSecond <post>",
+        })
+        os.utime(self.src / "blog" / "old.md", (1000000000, 1000000000))
+        self.index_path = self.root / ".build-pages.json"
+
+    def build(self, manifest=None):
+        page_index = PageIndex(self.index_path).load()
+        build_quietly(self.src, self.dest, str(self.template), "/",
+                      manifest, page_index=page_index)
+        page_index.save()
+        return PageIndex(self.index_path).load()
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html"), "/")
+        self.assertEqual(page_url(os.path.join("blog", "post", "index.html")),
+                         "/blog/post/")
+        self.assertEqual(page_url("blog/post.html"), "/blog/post.html")
+
+    def test_index_records_pages(self):
+        page_index = self.build()
+        entries = dict(page_index.previous.items())
+        home = entries[str(self.dest / "index.html")]
+        self.assertEqual(home["title"], "Home & away")
+        self.assertEqual(home["summary"], "Welcome home.")
+        self.assertEqual(home["source"], str(self.src / "index.md"))
+        self.assertEqual(entries[str(self.dest / "blog" / "old.html")]["updated"],
+                         "2001-09-09T01:46:40+00:00")
+
+    def test_incremental_build_keeps_skipped_pages(self):
+        manifest_path = self.root / ".build-manifest.json"
+        for _ in range(2):
+            manifest = BuildManifest(manifest_path, hash_file(self.template),
+                                     "/").load()
+            page_index = self.build(manifest)
+            manifest.save()
+        page_index.pages = page_index.previous
+        self.assertEqual([url for url, _ in page_index.entries(self.dest)],
+                         ["/", "/blog/new.html", "/blog/old.html"])
+
+    def test_sitemap(self):
+        page_index = self.build()
+        page_index.pages = page_index.previous
+        path = self.dest / "sitemap.xml"
+        write_sitemap(path, page_index.entries(self.dest), "https://example.com/",
+                      "/site/")
+        urls = ElementTree.parse(path).getroot()
+        locs = [url.findtext(f"{{{SITEMAP_NAMESPACE}}}loc") for url in urls]
+        self.assertEqual(locs, ["https://example.com/site/",
+                                "https://example.com/site/blog/new.html",
+                                "https://example.com/site/blog/old.html"])
+
+    def test_feed_lists_newest_posts_first(self):
+        page_index = self.build()
+        page_index.pages = page_index.previous
+        path = self.dest / "blog" / "feed.xml"
+        write_feed(path, page_index.entries(self.dest), "https://example.com")
+        feed = ElementTree.parse(path).getroot()
+        atom = f"{{{ATOM_NAMESPACE}}}"
+        self.assertEqual(feed.findtext(f"{atom}title"), "Home & away")
+        entries = feed.findall(f"{atom}entry")
+        self.assertEqual([entry.findtext(f"{atom}title") for entry in entries],
+                         ["New", "Old"])
+        self.assertEqual(entries[0].findtext(f"{atom}summary"), "Second <post>")
+        self.assertEqual(entries[1].findtext(f"{atom}id"),
+                         "https://example.com/blog/old.html")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from manifest import BuildManifest
+from staging import (StagedOutput, detach_output, exchange_paths, link_tree,
+                     prune_outputs)
+
+
+class TestStagedOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.docs = self.root / "docs"
+        (self.docs / "blog").mkdir(parents=True)
+        (self.docs / "index.html").write_text("old home")
+        (self.docs / "blog" / "post.html").write_text("old post")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reuse_links_the_previous_output(self):
+        staged = StagedOutput(self.docs)
+        build = staged.prepare(reuse=True)
+        self.assertTrue(os.path.samefile(build / "blog" / "post.html",
+                                         self.docs / "blog" / "post.html"))
+        self.assertEqual(list(StagedOutput(self.root / "none").prepare().iterdir()), [])
+
+    def test_prune_outputs_of_deleted_sources(self):
+        build = StagedOutput(self.docs).prepare(reuse=True)
+        (build / "index.html.gz").write_bytes(b"gz")
+        (build / "blog" / "post.html.gz").write_bytes(b"gz")
+        removed = prune_outputs(build, {str(build / "index.html")}, [".gz"])
+        self.assertEqual(sorted(removed), [str(build / "blog" / "post.html"),
+                                           str(build / "blog" / "post.html.gz")])
+        self.assertEqual(sorted(path.name for path in build.iterdir()),
+                         ["index.html", "index.html.gz"])
+        # The served output is untouched
+        self.assertTrue((self.docs / "blog" / "post.html").exists())
+
+    def test_rename_swap(self):
+        staged = StagedOutput(self.docs)
+        build = staged.prepare()
+        (build / "index.html").write_text("new home")
+        # The served tree is untouched until the commit
+        self.assertEqual((self.docs / "index.html").read_text(), "old home")
+        staged.commit().wait()
+        self.assertEqual((self.docs / "index.html").read_text(), "new home")
+        self.assertFalse((self.docs / "blog").exists())
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()), ["docs"])
+
+    def test_prepare_removes_leftovers(self):
+        (self.root / ".docs.old-1" / "blog").mkdir(parents=True)
+        (self.root / ".docs.staging").mkdir()
+        staged = StagedOutput(self.docs, swap="symlink")
+        staged.prepare()
+        staged.commit().wait()
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()),
+                         [".docs.builds", "docs"])
+
+        # Back to renames: the build the symlink pointed to goes, with its directory
+        staged = StagedOutput(self.docs)
+        staged.prepare()
+        staged.commit().wait()
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()), ["docs"])
+
+    def test_exchange_paths(self):
+        build = self.root / "build"
+        build.mkdir()
+        (build / "index.html").write_text("new home")
+        if not exchange_paths(build, self.docs):
+            self.skipTest("renameat2(RENAME_EXCHANGE) isn't available here")
+        self.assertEqual((self.docs / "index.html").read_text(), "new home")
+        self.assertEqual((build / "blog" / "post.html").read_text(), "old post")
+        with self.assertRaises(FileNotFoundError):
+            exchange_paths(self.root / "missing", self.docs)
+
+    def test_symlink_swap(self):
+        for content in ["first", "second"]:
+            staged = StagedOutput(self.docs, swap="symlink")
+            build = staged.prepare(reuse=True)
+            detach_output(build / "index.html")
+            (build / "index.html").write_text(content)
+            staged.commit().wait()
+            self.assertTrue(self.docs.is_symlink())
+            self.assertEqual((self.docs / "index.html").read_text(), content)
+            self.assertEqual((self.docs / "blog" / "post.html").read_text(), "old post")
+        self.assertEqual(len(list((self.root / ".docs.builds").iterdir())), 1)
+
+        # Back to a plain directory
+        staged = StagedOutput(self.docs)
+        staged.prepare(reuse=True)
+        staged.commit().wait()
+        self.assertFalse(self.docs.is_symlink())
+        self.assertEqual((self.docs / "index.html").read_text(), "second")
+
+    def test_detach_output_keeps_the_linked_file(self):
+        build = self.root / "build"
+        link_tree(self.docs, build)
+        detach_output(build / "index.html")
+        (build / "index.html").write_text("new home")
+        self.assertEqual((self.docs / "index.html").read_text(), "old home")
+        detach_output(build / "missing.html")
+
+    def test_manifest_relocate(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        manifest.previous = {str(self.docs / "index.html"): {"source": "index.md"}}
+        manifest.relocate(self.docs, self.root / "build")
+        self.assertEqual(list(manifest.previous),
+                         [str(self.root / "build" / "index.html")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -120,5 +120,10 @@ class TestTextNodeToHTMLNode(unittest.TestCase):
                                            "alt": ""})
 
 
+    def test_textnode_has_no_instance_dict(self):
+        node = TextNode("This is a text node", TextType.TEXT)
+        self.assertFalse(hasattr(node, "__dict__"))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -13,6 +13,8 @@ class TextType(Enum):
 # TextNode class represents various types of inline text that can exist
 # in HTML and markdown
 class TextNode():
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
 